@@ -0,0 +1,144 @@
+"""
+Batch analysis of many positions. The positions (FEN or EPD lines, from a list or straight from a file) are
+fanned out over a process pool and the results come back from a generator as soon as each one is done, so in
+completion order and not input order. Only a bounded number of positions is in flight at a time, the input is
+read as the pool catches up so memory stays flat however large the file is.
+
+    python -m Chess.Analysis positions.epd --depth 4 --workers 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from collections import namedtuple
+from Chess import ChessEngine, SmartMoveFinder
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+IN_FLIGHT_PER_WORKER = 2 #positions handed to the pool per worker before waiting for a result
+
+#index is the position's place in the input, bestMove is in long algebraic notation (e2e4) or None, score is in
+#pawns for the side to move, error is None or why the position couldn't be analysed and stats is the search's
+#Searcher.searchStats()
+AnalysisResult = namedtuple("AnalysisResult", "index fen id bestMove score depth nodes seconds error stats")
+
+
+'''
+Splits an input line into a FEN and the EPD id (None if it has none). An EPD line has only the first 4 FEN fields
+followed by operations like bm Nf3; id "pos 1"; so the move counters are filled in.
+'''
+def parsePositionLine(line):
+    fields = line.split()
+    if len(fields) >= 6 and fields[4].isdigit() and fields[5].isdigit():
+        return " ".join(fields[:6]), None
+    positionId = None
+    operations = " ".join(fields[4:])
+    for operation in operations.split(";"):
+        operation = operation.strip()
+        if operation.startswith("id "):
+            positionId = operation[3:].strip().strip('"')
+    return " ".join(fields[:4]) + " 0 1", positionId
+
+
+'''
+Analyses one position, runs in a worker. Errors (a bad FEN, or anything the move generation or search raises)
+come back in the result instead of being raised so a bad line doesn't stop the batch.
+'''
+def analyzePosition(index, line, backend, maxDepth, timeLimit, nodeLimit):
+    fen, positionId = parsePositionLine(line)
+    start = time.perf_counter()
+    try:
+        gs = ChessEngine.createGameState(backend, fen)
+    except ValueError as error:
+        return AnalysisResult(index, fen, positionId, None, None, 0, 0, 0.0, str(error), None)
+    searcher = SmartMoveFinder.Searcher() #unrelated positions have nothing to share, and it keeps calls independent
+    try:
+        move = searcher.findBestMove(gs, gs.getValidMoves(), maxDepth, timeLimit, nodeLimit)
+    except Exception as error:
+        return AnalysisResult(index, fen, positionId, None, None, 0, searcher.counter, time.perf_counter() - start,
+                              "search failed: " + repr(error), None)
+    return AnalysisResult(index, fen, positionId, move.getChessNotation() if move is not None else None,
+                          searcher.searchScore, searcher.completedDepth, searcher.counter,
+                          time.perf_counter() - start, None, searcher.searchStats())
+
+
+'''
+Skips blank lines and # comments, numbers the rest
+'''
+def positionLines(lines):
+    index = 0
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield index, line
+            index += 1
+
+
+'''
+Generator of an AnalysisResult for every position in lines, in the order they finish. At most maxInFlight
+positions (default IN_FLIGHT_PER_WORKER per worker) are queued in the pool at once. With one worker the positions
+are analysed in this process, in order. Closing the generator early stops the pool.
+'''
+def analyzePositions(lines, maxDepth=SmartMoveFinder.DEFAULT_DEPTH, timeLimit=None, nodeLimit=None,
+                     workers=DEFAULT_WORKERS, backend="array", maxInFlight=None):
+    if workers <= 1:
+        for index, line in positionLines(lines):
+            yield analyzePosition(index, line, backend, maxDepth, timeLimit, nodeLimit)
+        return
+    maxInFlight = max(1, maxInFlight if maxInFlight is not None else workers * IN_FLIGHT_PER_WORKER)
+    results = queue.Queue() #filled by the pool's result thread
+    inFlight = 0
+    with multiprocessing.Pool(workers) as pool:
+        for index, line in positionLines(lines):
+            if inFlight >= maxInFlight:
+                yield results.get()
+                inFlight -= 1
+            pool.apply_async(analyzePosition, (index, line, backend, maxDepth, timeLimit, nodeLimit),
+                             callback=results.put, error_callback=failedPosition(results, index, line))
+            inFlight += 1
+        while inFlight:
+            yield results.get()
+            inFlight -= 1
+
+
+'''
+Error callback for one position's task: what analyzePosition couldn't catch itself (the task failing to reach or
+come back from the worker) still becomes an error result for that position
+'''
+def failedPosition(results, index, line):
+    def callback(error):
+        results.put(AnalysisResult(index, line, None, None, None, 0, 0, 0.0, "worker failed: " + repr(error), None))
+    return callback
+
+
+def formatResult(result):
+    if result.error is not None:
+        return "{}\t{}\terror: {}".format(result.index, result.fen, result.error)
+    return "{}\t{}\t{}\t{:.2f}\tdepth {}\tnodes {}\t{:.2f}s{}".format(
+        result.index, result.fen, result.bestMove or "none", result.score, result.depth, result.nodes,
+        result.seconds, "\tid " + result.id if result.id else "")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="analyse every position of a FEN or EPD file")
+    parser.add_argument("file", nargs="?", help="one position per line, standard input if left out")
+    parser.add_argument("--depth", "-d", type=int, default=SmartMoveFinder.DEFAULT_DEPTH)
+    parser.add_argument("--time", "-t", type=int, help="milliseconds per position")
+    parser.add_argument("--nodes", "-n", type=int, help="nodes per position")
+    parser.add_argument("--workers", "-w", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--backend", default="array", choices=ChessEngine.BACKENDS)
+    args = parser.parse_args(argv)
+    lines = open(args.file) if args.file else sys.stdin
+    try:
+        for result in analyzePositions(lines, args.depth, args.time, args.nodes, args.workers, args.backend):
+            print(formatResult(result), flush=True)
+    finally:
+        if args.file:
+            lines.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
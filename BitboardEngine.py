@@ -0,0 +1,373 @@
+"""
+Bitboard version of the GameState. The position is kept as 12 piece bitboards (one python int per piece type
+and colour) plus occupancy masks, and the legal moves are generated with precomputed attack tables instead of
+walking the 8x8 board square by square. The numpy board is still kept in sync so the gui and SmartMoveFinder
+can use this class exactly like the normal GameState.
+Square numbering follows the board array: square = row*8 + col, so a8 is 0 and h1 is 63.
+"""
+from Chess import ChessEngine
+
+PIECES = ("wP", "wR", "wN", "wB", "wQ", "wK", "bP", "bR", "bN", "bB", "bQ", "bK")
+FULL_BOARD = (1 << 64) - 1
+
+#up, left, down, right, then the diagonals. same order as checkForPinsAndChecks
+DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+ROOK_DIRECTIONS = DIRECTIONS[:4]
+BISHOP_DIRECTIONS = DIRECTIONS[4:]
+KNIGHT_OFFSETS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+
+
+def _onBoard(r, c):
+    return 0 <= r <= 7 and 0 <= c <= 7
+
+
+def _leaperTable(offsets):
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        attacks = 0
+        for dr, dc in offsets:
+            if _onBoard(r + dr, c + dc):
+                attacks |= 1 << ((r + dr) * 8 + c + dc)
+        table.append(attacks)
+    return table
+
+
+def _rayTable(d):
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        ray = 0
+        for i in range(1, 8):
+            if not _onBoard(r + d[0] * i, c + d[1] * i):
+                break
+            ray |= 1 << ((r + d[0] * i) * 8 + c + d[1] * i)
+        table.append(ray)
+    return table
+
+
+KNIGHT_ATTACKS = _leaperTable(KNIGHT_OFFSETS)
+KING_ATTACKS = _leaperTable(DIRECTIONS)
+#squares attacked by a pawn of the given colour standing on a square
+PAWN_ATTACKS = {'w': _leaperTable(((-1, -1), (-1, 1))), 'b': _leaperTable(((1, -1), (1, 1)))}
+RAYS = {d: _rayTable(d) for d in DIRECTIONS}
+#a ray is "positive" if the square index grows along it, so its nearest blocker is the lowest set bit
+ROOK_RAYS = tuple((RAYS[d], d[0] > 0 or (d[0] == 0 and d[1] > 0)) for d in ROOK_DIRECTIONS)
+BISHOP_RAYS = tuple((RAYS[d], d[0] > 0) for d in BISHOP_DIRECTIONS)
+
+
+def _betweenTable():
+    between = [[0] * 64 for _ in range(64)]
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        for d in DIRECTIONS:
+            path = 0
+            for i in range(1, 8):
+                if not _onBoard(r + d[0] * i, c + d[1] * i):
+                    break
+                target = (r + d[0] * i) * 8 + c + d[1] * i
+                between[sq][target] = path
+                path |= 1 << target
+    return between
+
+
+BETWEEN = _betweenTable() #squares strictly between two squares on the same line, 0 otherwise
+
+
+def lsb(bb):
+    return (bb & -bb).bit_length() - 1
+
+
+def squares(bb):
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def slidingAttacks(sq, occupied, rays):
+    attacks = 0
+    for ray, positive in rays:
+        attack = ray[sq]
+        blockers = attack & occupied
+        if blockers:
+            blocker = (blockers & -blockers).bit_length() - 1 if positive else blockers.bit_length() - 1
+            attack ^= ray[blocker]
+        attacks |= attack
+    return attacks
+
+
+def rookAttacks(sq, occupied):
+    return slidingAttacks(sq, occupied, ROOK_RAYS)
+
+
+def bishopAttacks(sq, occupied):
+    return slidingAttacks(sq, occupied, BISHOP_RAYS)
+
+
+class BitboardGameState(ChessEngine.GameState):
+
+    backend = "bitboard"
+
+    def __init__(self):
+        super().__init__()
+        self.setBitboardsFromBoard()
+
+    '''
+    Rebuilds the bitboards and the square lookup from the numpy board
+    '''
+    def setBitboardsFromBoard(self):
+        self.pieceBitboards = {piece: 0 for piece in PIECES}
+        self.squares = {} #(row, col) -> piece, this is passed to Move in place of the numpy board
+        for r in range(8):
+            for c in range(8):
+                piece = str(self.board[r, c])
+                self.squares[(r, c)] = piece
+                if piece != "--":
+                    self.pieceBitboards[piece] |= 1 << (r * 8 + c)
+        self.updateOccupancy()
+
+    def syncPosition(self):
+        super().syncPosition()
+        self.setBitboardsFromBoard()
+
+    def updateOccupancy(self):
+        pbb = self.pieceBitboards
+        self.occupancy = {
+            'w': pbb["wP"] | pbb["wR"] | pbb["wN"] | pbb["wB"] | pbb["wQ"] | pbb["wK"],
+            'b': pbb["bP"] | pbb["bR"] | pbb["bN"] | pbb["bB"] | pbb["bQ"] | pbb["bK"],
+        }
+        self.allOccupancy = self.occupancy['w'] | self.occupancy['b']
+
+    '''
+    Flips the bitboards for every square a move touches. Flipping twice puts everything back, so the same call
+    is used for making and undoing the move.
+    '''
+    def toggleMove(self, move):
+        pbb = self.pieceBitboards
+        start = move.startRow * 8 + move.startCol
+        end = move.endRow * 8 + move.endCol
+        pbb[move.pieceMoved] ^= 1 << start
+        if move.pawnPromotion:
+            pbb[move.pieceMoved[0] + move.promotionPiece] ^= 1 << end
+        else:
+            pbb[move.pieceMoved] ^= 1 << end
+        if move.enPassant:
+            pbb[move.pieceCaptured] ^= 1 << (move.startRow * 8 + move.endCol)
+        elif move.pieceCaptured != "--":
+            pbb[move.pieceCaptured] ^= 1 << end
+        if move.castle:
+            rook = move.pieceMoved[0] + "R"
+            if move.endCol - move.startCol == 2: #kingside castle
+                pbb[rook] ^= (1 << (end + 1)) | (1 << (end - 1))
+            else:
+                pbb[rook] ^= (1 << (end - 2)) | (1 << (end + 1))
+        self.updateOccupancy()
+
+    def makeMove(self, move, board=None):
+        super().makeMove(move)
+        self.toggleMove(move)
+        sqs = self.squares
+        sqs[(move.startRow, move.startCol)] = "--"
+        sqs[(move.endRow, move.endCol)] = move.pieceMoved[0] + move.promotionPiece if move.pawnPromotion else move.pieceMoved
+        if move.enPassant:
+            sqs[(move.startRow, move.endCol)] = "--"
+        if move.castle:
+            rook = move.pieceMoved[0] + "R"
+            if move.endCol - move.startCol == 2:
+                sqs[(move.endRow, move.endCol + 1)] = "--"
+                sqs[(move.endRow, move.endCol - 1)] = rook
+            else:
+                sqs[(move.endRow, move.endCol - 2)] = "--"
+                sqs[(move.endRow, move.endCol + 1)] = rook
+
+    def undoMove(self, board=None):
+        if len(self.moveLog) == 0:
+            return
+        move = self.moveLog[-1]
+        super().undoMove()
+        self.toggleMove(move)
+        sqs = self.squares
+        sqs[(move.startRow, move.startCol)] = move.pieceMoved
+        if move.enPassant:
+            sqs[(move.endRow, move.endCol)] = "--"
+            sqs[(move.startRow, move.endCol)] = move.pieceCaptured
+        else:
+            sqs[(move.endRow, move.endCol)] = move.pieceCaptured
+        if move.castle:
+            rook = move.pieceMoved[0] + "R"
+            if move.endCol - move.startCol == 2:
+                sqs[(move.endRow, move.endCol + 1)] = rook
+                sqs[(move.endRow, move.endCol - 1)] = "--"
+            else:
+                sqs[(move.endRow, move.endCol - 2)] = rook
+                sqs[(move.endRow, move.endCol + 1)] = "--"
+
+    '''
+    Bitboard of the pieces of colour byColor that attack square sq with the given occupancy
+    '''
+    def attackersTo(self, sq, byColor, occupied):
+        pbb = self.pieceBitboards
+        queens = pbb[byColor + "Q"]
+        return (KNIGHT_ATTACKS[sq] & pbb[byColor + "N"]) | \
+               (KING_ATTACKS[sq] & pbb[byColor + "K"]) | \
+               (PAWN_ATTACKS['b' if byColor == 'w' else 'w'][sq] & pbb[byColor + "P"]) | \
+               (rookAttacks(sq, occupied) & (pbb[byColor + "R"] | queens)) | \
+               (bishopAttacks(sq, occupied) & (pbb[byColor + "B"] | queens))
+
+    def squareUnderAttack(self, r, c):
+        enemyColor = "b" if self.whiteToMove else "w"
+        return self.attackersTo(r * 8 + c, enemyColor, self.allOccupancy) != 0
+
+    def squareAttackedBy(self, r, c, color):
+        return self.attackersTo(r * 8 + c, color, self.allOccupancy) != 0
+
+    '''
+    All moves considering checks. Pins and checks come straight from the attack tables so no pseudo legal
+    move is ever generated and thrown away.
+    '''
+    def getValidMoves(self, board=None):
+        moves = self.generateLegalMoves()
+        if len(moves) == 0:
+            if self.inCheck:
+                self.checkMate = True
+            else:
+                self.staleMate = True
+        else:
+            self.checkMate = False
+            self.staleMate = False
+        return moves
+
+    '''
+    Only the legal captures and promotions, the target squares are masked down to enemy pieces before any
+    move is built
+    '''
+    def getValidCaptures(self):
+        return self.generateLegalMoves(quiets=False)
+
+    '''
+    Only the legal moves that are not captures or promotions (castling included), targets are the empty squares
+    '''
+    def getQuietMoves(self):
+        return self.generateLegalMoves(captures=False)
+
+    def isInCheck(self):
+        return self.kingCheckers() != 0
+
+    '''
+    Bitboard of the enemy pieces giving check, kept until the position changes so an isInCheck followed by move
+    generation only looks once
+    '''
+    def kingCheckers(self):
+        if self.checkScanKey != self._zobristKey:
+            allyColor, enemyColor = ("w", "b") if self.whiteToMove else ("b", "w")
+            self.checkScan = self.attackersTo(lsb(self.pieceBitboards[allyColor + "K"]), enemyColor,
+                                              self.allOccupancy)
+            self.checkScanKey = self._zobristKey
+        return self.checkScan
+
+    def generateLegalMoves(self, captures=True, quiets=True):
+        allyColor, enemyColor = ("w", "b") if self.whiteToMove else ("b", "w")
+        pbb = self.pieceBitboards
+        own = self.occupancy[allyColor]
+        enemy = self.occupancy[enemyColor]
+        occupied = own | enemy
+        sqs = self.squares
+        moves = []
+        kingSq = lsb(pbb[allyColor + "K"])
+        kingRow, kingCol = divmod(kingSq, 8)
+        checkers = self.kingCheckers()
+        self.inCheck = checkers != 0
+
+        #king moves, the king is taken off the board so it can't hide behind itself from a slider
+        withoutKing = occupied ^ (1 << kingSq)
+        targets = (enemy if captures else 0) | (~occupied if quiets else 0)
+        for to in squares(KING_ATTACKS[kingSq] & targets):
+            if not self.attackersTo(to, enemyColor, withoutKing):
+                moves.append(ChessEngine.Move((kingRow, kingCol), divmod(to, 8), sqs))
+
+        if checkers & (checkers - 1) == 0: #not in double check so other pieces can move
+            if checkers:
+                checkMask = checkers | BETWEEN[kingSq][lsb(checkers)]
+            else:
+                checkMask = FULL_BOARD
+                if quiets:
+                    self.getCastleMoves(kingRow, kingCol, moves)
+            #pins, look from the king through only enemy pieces to find possible pinners
+            enemyQueens = pbb[enemyColor + "Q"]
+            snipers = (rookAttacks(kingSq, enemy) & (pbb[enemyColor + "R"] | enemyQueens)) | \
+                      (bishopAttacks(kingSq, enemy) & (pbb[enemyColor + "B"] | enemyQueens))
+            pinned = 0
+            pinRays = {}
+            for sniper in squares(snipers):
+                blockers = BETWEEN[kingSq][sniper] & occupied
+                if blockers and blockers & (blockers - 1) == 0 and blockers & own:
+                    pinned |= blockers
+                    pinRays[lsb(blockers)] = BETWEEN[kingSq][sniper] | (1 << sniper)
+            targets &= checkMask
+            for sq in squares(pbb[allyColor + "N"] & ~pinned): #a pinned knight can never move
+                self.addMoves(sq, KNIGHT_ATTACKS[sq] & targets, moves)
+            for sq in squares(pbb[allyColor + "B"] | pbb[allyColor + "Q"]):
+                attacks = bishopAttacks(sq, occupied) & targets
+                self.addMoves(sq, attacks & pinRays[sq] if pinned >> sq & 1 else attacks, moves)
+            for sq in squares(pbb[allyColor + "R"] | pbb[allyColor + "Q"]):
+                attacks = rookAttacks(sq, occupied) & targets
+                self.addMoves(sq, attacks & pinRays[sq] if pinned >> sq & 1 else attacks, moves)
+            self.getPawnBitboardMoves(allyColor, enemy, occupied, checkMask, pinned, pinRays, captures, quiets, moves)
+        return moves
+
+    def addMoves(self, sq, targets, moves):
+        startSq = divmod(sq, 8)
+        for to in squares(targets):
+            moves.append(ChessEngine.Move(startSq, divmod(to, 8), self.squares))
+
+    def getPawnBitboardMoves(self, allyColor, enemy, occupied, checkMask, pinned, pinRays, captures, quiets, moves):
+        sqs = self.squares
+        if allyColor == 'w':
+            step, startRow, backRow = -8, 6, 0
+        else:
+            step, startRow, backRow = 8, 1, 7
+        epSq = self.enpassantPossible[0] * 8 + self.enpassantPossible[1] if self.enpassantPossible != () else -1
+        for sq in squares(self.pieceBitboards[allyColor + "P"]):
+            r, c = divmod(sq, 8)
+            allowed = checkMask & pinRays[sq] if pinned >> sq & 1 else checkMask
+            pinMask = pinRays[sq] if pinned >> sq & 1 else FULL_BOARD
+            one = sq + step
+            if not occupied >> one & 1 and (captures if one // 8 == backRow else quiets): #promotions go with captures
+                if allowed >> one & 1:
+                    ChessEngine.addPawnMove(moves, (r, c), divmod(one, 8), sqs, one // 8 == backRow)
+                two = one + step
+                if quiets and r == startRow and not occupied >> two & 1 and allowed >> two & 1:
+                    moves.append(ChessEngine.Move((r, c), divmod(two, 8), sqs))
+            if not captures:
+                continue
+            attacks = PAWN_ATTACKS[allyColor][sq]
+            for to in squares(attacks & enemy & allowed):
+                ChessEngine.addPawnMove(moves, (r, c), divmod(to, 8), sqs, to // 8 == backRow)
+            if epSq >= 0 and attacks >> epSq & 1:
+                if pinMask >> epSq & 1 and self.enPassantIsLegal(allyColor, sq, epSq):
+                    moves.append(ChessEngine.Move((r, c), divmod(epSq, 8), sqs, enPassant=True))
+
+    '''
+    En passant takes two pieces off one rank at once, so instead of special casing it the capture is played on
+    the bitboards and the king is checked directly.
+    '''
+    def enPassantIsLegal(self, allyColor, start, epSq):
+        enemyColor = 'b' if allyColor == 'w' else 'w'
+        pbb = self.pieceBitboards
+        captured = start // 8 * 8 + epSq % 8
+        pbb[enemyColor + "P"] ^= 1 << captured
+        occupied = self.allOccupancy ^ (1 << start) ^ (1 << captured) ^ (1 << epSq)
+        safe = not self.attackersTo(lsb(pbb[allyColor + "K"]), enemyColor, occupied)
+        pbb[enemyColor + "P"] ^= 1 << captured
+        return safe
+
+    def getKingsideCastleMoves(self, r, c, moves, board=None):
+        if self.squares[(r, c + 1)] == "--" and self.squares[(r, c + 2)] == "--":
+            if not self.squareUnderAttack(r, c + 1) and not self.squareUnderAttack(r, c + 2):
+                moves.append(ChessEngine.Move((r, c), (r, c + 2), self.squares, castle=True))
+
+    def getQueensideCastleMoves(self, r, c, moves, board=None):
+        if self.squares[(r, c - 1)] == "--" and self.squares[(r, c - 2)] == "--" and self.squares[(r, c - 3)] == "--":
+            if not self.squareUnderAttack(r, c - 1) and not self.squareUnderAttack(r, c - 2):
+                moves.append(ChessEngine.Move((r, c), (r, c - 2), self.squares, castle=True))
@@ -3,14 +3,76 @@ This class is responsible for storing all the information about the current stat
 It will also be responsible for determining the valid moves at the current state. It will also keep
 a move log.
 """
-import copy
+import random
 import numpy as np
+from Chess.Evaluation import materialScores, positionScores, scoreBoardFromScratch
+
+BACKENDS = ("array", "bitboard")
+DEBUG_INCREMENTAL_EVAL = False #check the running evaluation totals against a full recount after every move
+
+#zobrist keys, seeded so the same position always hashes to the same number between runs and processes
+_zobristRandom = random.Random(2023)
+ZOBRIST_PIECES = {color + piece: [_zobristRandom.getrandbits(64) for _ in range(64)]
+                  for color in "wb" for piece in "PRNBQK"}
+ZOBRIST_BLACK_TO_MOVE = _zobristRandom.getrandbits(64)
+ZOBRIST_CASTLING = [_zobristRandom.getrandbits(64) for _ in range(16)] #one key per combination of the 4 rights
+ZOBRIST_ENPASSANT = [_zobristRandom.getrandbits(64) for _ in range(8)] #one key per file
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+#castling rights are kept as 4 bits, the same order as CastleRights.index()
+WKS, BKS, WQS, BQS = 1, 2, 4, 8
+#rights still left after a move from or to a square: moving the king or a rook, or capturing a rook, loses them
+CASTLING_MASK = [15] * 64
+CASTLING_MASK[0], CASTLING_MASK[4], CASTLING_MASK[7] = 15 ^ BQS, 15 ^ BKS ^ BQS, 15 ^ BKS
+CASTLING_MASK[56], CASTLING_MASK[60], CASTLING_MASK[63] = 15 ^ WQS, 15 ^ WKS ^ WQS, 15 ^ WKS
+
+#one undo record per ply, written in place by makeMove so making and undoing moves doesn't allocate
+UNDO_STACK_SIZE = 512 #plies, the stack grows if a game gets longer than this
+CASTLING, ENPASSANT, WHITE_KING, BLACK_KING, ZOBRIST, MATERIAL, POSITION, HALFMOVE = range(8) #record fields
+
+#indexing the numpy board makes a new numpy string every time, moves keep these shared python strings instead
+PIECE_NAMES = {name: name for name in [color + piece for color in "wb" for piece in "PRNBQK"] + ["--"]}
+PROMOTION_PIECES = ("Q", "R", "B", "N") #queen first, a plain from-to move (a click in the ui) means the queen
+
+
+'''
+Creates a new game state, at the start position or at fen if one is given. "array" is the original numpy board, "bitboard" keeps the same board in sync but
+generates moves from piece bitboards (see BitboardEngine). Both have the same makeMove/undoMove/getValidMoves api.
+The moves (long algebraic notation, e2e4) are then played from there, see GameState.reversibleHistory.
+'''
+def createGameState(backend="array", fen=None, moves=()):
+    if backend == "bitboard":
+        from Chess.BitboardEngine import BitboardGameState
+        cls = BitboardGameState
+    elif backend == "array":
+        cls = GameState
+    else:
+        raise ValueError("unknown backend " + str(backend) + ", expected one of " + str(BACKENDS))
+    gs = cls() if fen is None else cls.from_fen(fen)
+    for notation in moves:
+        for move in gs.getValidMoves():
+            if move.getChessNotation() == notation:
+                gs.makeMove(move)
+                break
+        else:
+            raise ValueError("illegal move " + notation + " in " + gs.to_fen())
+    return gs
+
+
+'''
+Adds a pawn move to the list, or one move for every piece it can promote to when it reaches the back row
+'''
+def addPawnMove(moves, startSq, endSq, board, pawnPromotion=False):
+    if pawnPromotion:
+        for promotionPiece in PROMOTION_PIECES:
+            moves.append(Move(startSq, endSq, board, pawnPromotion=True, promotionPiece=promotionPiece))
+    else:
+        moves.append(Move(startSq, endSq, board))
 
 
 class GameState():
 
-    checkMate = False
-    staleMate = False
+    backend = "array" #name createGameState knows this class by
 
     def __init__(self):
         self.board = np.array([
@@ -27,31 +89,186 @@ class GameState():
                               'Q':self.getQueenMoves, 'K':self.getKingMoves
                               }
         self.whiteToMove = True
+        #set by getValidMoves, kept per game state so a search on another game state (another thread) can't touch them
+        self.checkMate = False
+        self.staleMate = False
         self.whiteKingLocation = (7, 4)
         self.blackKingLocation = (0, 4)
         self.moveLog = []
         self.inCheck = False
         self.pins = []
         self.checks = []
+        self.checkScanKey = None #zobrist key of the position checkScan belongs to
+        self.checkScan = None
         self.enpassantPossible = () #coordinates of the square where an enpassant capture is available
-        self.enpassantPossibleLog = [self.enpassantPossible]
         #castling rights
-        self.currentCastlingRights = CastleRights(True, True, True, True)
-        self.castleRightsLog = [CastleRights(self.currentCastlingRights.wks, self.currentCastlingRights.bks,
-                                             self.currentCastlingRights.wqs, self.currentCastlingRights.bqs)]
+        self.castlingRights = WKS | BKS | WQS | BQS
+        self._zobristKey = self.computeZobristKey()
+        #running evaluation totals, white positive (see Evaluation)
+        self.materialScore, self.positionScore = scoreBoardFromScratch(self.board)
+        #move counters as in FEN: plies since the last capture or pawn move, and the number of the current move
+        self.halfmoveClock = 0
+        self.fullmoveNumber = 1
+        #what makeMove can't work out backwards from the move, record i belongs to moveLog[i]
+        self.undoStack = [[None] * 8 for _ in range(UNDO_STACK_SIZE)]
+        self.nullMoveStack = [] #(en passant square, zobrist key, halfmove clock) of every null move made
+
+    '''
+    Recomputes everything that follows from the board, side to move, castling rights and en passant square, for
+    when those were set directly instead of being reached through makeMove. The move history is cleared.
+    '''
+    def syncPosition(self):
+        for r in range(8):
+            for c in range(8):
+                if self.board[r, c] == "wK":
+                    self.whiteKingLocation = (r, c)
+                elif self.board[r, c] == "bK":
+                    self.blackKingLocation = (r, c)
+        self.moveLog = []
+        self._zobristKey = self.computeZobristKey()
+        self.materialScore, self.positionScore = scoreBoardFromScratch(self.board)
+
+    '''
+    Builds a game state from a FEN string. The counters can be left off, they default to 0 and 1.
+    '''
+    @classmethod
+    def from_fen(cls, fen):
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError("fen needs at least placement, side, castling and en passant fields: " + fen)
+        gs = cls()
+        rows = fields[0].split("/")
+        if len(rows) != 8:
+            raise ValueError("bad piece placement in fen: " + fen)
+        for r in range(8):
+            c = 0
+            for char in rows[r]:
+                if char.isdigit():
+                    for i in range(int(char)):
+                        if c < 8:
+                            gs.board[r, c] = "--"
+                        c += 1
+                elif char.upper() in "PRNBQK" and c < 8:
+                    gs.board[r, c] = ("w" if char.isupper() else "b") + char.upper()
+                    c += 1
+                else:
+                    raise ValueError("bad piece placement in fen: " + fen)
+            if c != 8:
+                raise ValueError("bad piece placement in fen: " + fen)
+        if (gs.board == "wK").sum() != 1 or (gs.board == "bK").sum() != 1:
+            raise ValueError("fen needs exactly one king of each colour: " + fen)
+        backRanks = gs.board[[0, 7]]
+        if ((backRanks == "wP") | (backRanks == "bP")).any():
+            raise ValueError("fen has a pawn on the first or last rank: " + fen)
+        if fields[1] not in ("w", "b"):
+            raise ValueError("bad side to move in fen: " + fen)
+        gs.whiteToMove = fields[1] == "w"
+        castling = fields[2]
+        board = gs.board
+        #a right only counts if the king and rook are still at home, so a sloppy fen can't castle a missing rook
+        gs.castlingRights = 0
+        for char, right, king, rook in (("K", WKS, (7, 4), (7, 7)), ("k", BKS, (0, 4), (0, 7)),
+                                        ("Q", WQS, (7, 4), (7, 0)), ("q", BQS, (0, 4), (0, 0))):
+            color = "w" if char.isupper() else "b"
+            if char in castling and board[king] == color + "K" and board[rook] == color + "R":
+                gs.castlingRights |= right
+        #the square has to be one a pawn of the side that just moved skipped over, with that pawn right behind it
+        enPassantRank = "6" if gs.whiteToMove else "3"
+        if fields[3] == "-":
+            gs.enpassantPossible = ()
+        elif len(fields[3]) == 2 and fields[3][0] in Move.filesToCols and fields[3][1] == enPassantRank:
+            r, c = Move.ranksToRows[fields[3][1]], Move.filesToCols[fields[3][0]]
+            pawnRow = r + 1 if gs.whiteToMove else r - 1
+            if board[r, c] != "--" or board[pawnRow, c] != ("b" if gs.whiteToMove else "w") + "P":
+                raise ValueError("no pawn can have just skipped the en passant square in fen: " + fen)
+            gs.enpassantPossible = (r, c)
+        else:
+            raise ValueError("bad en passant square in fen: " + fen)
+        try:
+            gs.halfmoveClock = int(fields[4]) if len(fields) > 4 else 0
+            gs.fullmoveNumber = int(fields[5]) if len(fields) > 5 else 1
+        except ValueError:
+            raise ValueError("bad move counters in fen: " + fen)
+        if gs.halfmoveClock < 0 or gs.fullmoveNumber < 1:
+            raise ValueError("bad move counters in fen: " + fen)
+        gs.syncPosition()
+        #the side that just moved can't have left its own king in check
+        kingRow, kingCol = gs.blackKingLocation if gs.whiteToMove else gs.whiteKingLocation
+        if gs.squareAttackedBy(kingRow, kingCol, "w" if gs.whiteToMove else "b"):
+            raise ValueError("the side not to move is in check in fen: " + fen)
+        return gs
+
+    '''
+    The position as a FEN string
+    '''
+    def to_fen(self):
+        rows = []
+        for r in range(8):
+            row = ""
+            empty = 0
+            for c in range(8):
+                piece = self.board[r, c]
+                if piece == "--":
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += piece[1] if piece[0] == "w" else piece[1].lower()
+            if empty:
+                row += str(empty)
+            rows.append(row)
+        rights = self.castlingRights
+        castling = ("K" if rights & WKS else "") + ("Q" if rights & WQS else "") + \
+                   ("k" if rights & BKS else "") + ("q" if rights & BQS else "")
+        if self.enpassantPossible != ():
+            enPassant = Move.colsToFiles[self.enpassantPossible[1]] + Move.rowsToRanks[self.enpassantPossible[0]]
+        else:
+            enPassant = "-"
+        return " ".join(["/".join(rows), "w" if self.whiteToMove else "b", castling or "-", enPassant,
+                         str(self.halfmoveClock), str(self.fullmoveNumber)])
 
         '''
         Takes a move as a parameter and executes it (it will not work for castling, pawn promotion, and en-passant)
         '''
 
-    def makeMove(self, move, board=np.zeros((8, 8))):
+    def makeMove(self, move, board=None):
 
-        if board[1][1] == 0:
+        if board is None:
             board = self.board
 
+        ply = len(self.moveLog)
+        if ply == len(self.undoStack):
+            self.undoStack.append([None] * 8)
+        record = self.undoStack[ply]
+        record[CASTLING] = self.castlingRights
+        record[ENPASSANT] = self.enpassantPossible
+        record[WHITE_KING] = self.whiteKingLocation
+        record[BLACK_KING] = self.blackKingLocation
+        record[ZOBRIST] = self._zobristKey
+        record[MATERIAL] = self.materialScore
+        record[POSITION] = self.positionScore
+        record[HALFMOVE] = self.halfmoveClock
+
         board[move.endRow, move.endCol] = move.pieceMoved
         board[move.startRow, move.startCol] = "--"
+        key = self._zobristKey ^ ZOBRIST_BLACK_TO_MOVE ^ ZOBRIST_CASTLING[self.castlingRights]
+        if self.enpassantPossible != ():
+            key ^= ZOBRIST_ENPASSANT[self.enpassantPossible[1]]
+        start = move.startRow * 8 + move.startCol
+        end = move.endRow * 8 + move.endCol
+        key ^= ZOBRIST_PIECES[move.pieceMoved][start]
+        material = self.materialScore
+        position = self.positionScore - positionScores[move.pieceMoved][start]
+        if move.pieceCaptured != "--":
+            capturedSquare = move.startRow * 8 + move.endCol if move.enPassant else end
+            key ^= ZOBRIST_PIECES[move.pieceCaptured][capturedSquare]
+            material -= materialScores[move.pieceCaptured]
+            position -= positionScores[move.pieceCaptured][capturedSquare]
         self.moveLog.append(move) #log the move so that we can review it later
+        self.halfmoveClock = 0 if move.pieceMoved[1] == 'P' or move.pieceCaptured != "--" else self.halfmoveClock + 1
+        if not self.whiteToMove:
+            self.fullmoveNumber += 1
         self.whiteToMove = not self.whiteToMove #swap players
         #update the kings location
         if move.pieceMoved == "wK":
@@ -70,51 +287,62 @@ class GameState():
 
         #pawn promotion with change piece
         if move.pawnPromotion:
-            promotedPiece = "Q"   # we can ask for what to promote to and also make this part of the ui later
+            promotedPiece = move.promotionPiece
             board[move.endRow, move.endCol] = move.pieceMoved[0] + promotedPiece
+            key ^= ZOBRIST_PIECES[move.pieceMoved[0] + promotedPiece][end]
+            material += materialScores[move.pieceMoved[0] + promotedPiece] - materialScores[move.pieceMoved]
+            position += positionScores[move.pieceMoved[0] + promotedPiece][end]
+        else:
+            key ^= ZOBRIST_PIECES[move.pieceMoved][end]
+            position += positionScores[move.pieceMoved][end]
 
         #castle move
         if move.castle:
+            rookKeys = ZOBRIST_PIECES[move.pieceMoved[0] + "R"]
+            rookScores = positionScores[move.pieceMoved[0] + "R"]
             if move.endCol - move.startCol == 2: #kingside castle
                 board[move.endRow, move.endCol - 1] = board[move.endRow, move.endCol + 1]
                 board[move.endRow, move.endCol + 1] = "--"
+                key ^= rookKeys[end + 1] ^ rookKeys[end - 1]
+                position += rookScores[end - 1] - rookScores[end + 1]
             else:
                 board[move.endRow, move.endCol + 1] = board[move.endRow, move.endCol - 2]
                 board[move.endRow, move.endCol - 2] = "--"
-        self.enpassantPossibleLog.append(self.enpassantPossible)
+                key ^= rookKeys[end - 2] ^ rookKeys[end + 1]
+                position += rookScores[end + 1] - rookScores[end - 2]
+        self.materialScore = material
+        self.positionScore = position
         # update castling rights
-        self.updateCastleRights(move)
-        self.castleRightsLog.append(CastleRights(self.currentCastlingRights.wks, self.currentCastlingRights.bks,
-                                                 self.currentCastlingRights.wqs, self.currentCastlingRights.bqs))
+        self.castlingRights &= CASTLING_MASK[start] & CASTLING_MASK[end]
+        key ^= ZOBRIST_CASTLING[self.castlingRights]
+        if self.enpassantPossible != ():
+            key ^= ZOBRIST_ENPASSANT[self.enpassantPossible[1]]
+        self._zobristKey = key
+        if DEBUG_INCREMENTAL_EVAL:
+            self.checkIncrementalScores()
     '''
     Undo the last move made
     '''
 
-    def undoMove(self, board=np.zeros((8, 8))):
-        if board[1][1] == 0:
+    def undoMove(self, board=None):
+        if board is None:
             board = self.board
         if len(self.moveLog) != 0:
             move = self.moveLog.pop()
+            record = self.undoStack[len(self.moveLog)]
             board[move.startRow, move.startCol] = move.pieceMoved
             board[move.endRow, move.endCol] = move.pieceCaptured
             self.whiteToMove = not self.whiteToMove #switch turns back
-            #update kings location for undo also
-            if move.pieceMoved == "wK":
-                self.whiteKingLocation = (move.startRow, move.startCol)
-            elif move.pieceMoved == "bK":
-                self.blackKingLocation = (move.startRow, move.startCol)
+            #kings location, en passant square and castling rights (given back if the move took them away)
+            self.whiteKingLocation = record[WHITE_KING]
+            self.blackKingLocation = record[BLACK_KING]
+            self.enpassantPossible = record[ENPASSANT]
+            self.castlingRights = record[CASTLING]
 
             #undo the enpassant move
             if move.enPassant:
                 board[move.endRow, move.endCol] = '--' #leave landing square blank
                 board[move.startRow, move.endCol] = move.pieceCaptured
-            self.enpassantPossibleLog.pop()
-            self.enpassantPossible = copy.deepcopy(self.enpassantPossibleLog[-1])
-
-            #give back castling rights if move took them away
-            self.castleRightsLog.pop() # remove last moves updates
-            castleRights = copy.deepcopy(self.castleRightsLog[-1])
-            self.currentCastlingRights = castleRights
             #undo castle moves
             if move.castle:
                 if move.endCol - move.startCol == 2:
@@ -123,28 +351,185 @@ class GameState():
                 else:
                     board[move.endRow, move.endCol - 2] = board[move.endRow, move.endCol + 1]
                     board[move.endRow, move.endCol + 1] = "--"
-            GameState.checkMate = False
-            GameState.staleMate = False
+            self._zobristKey = record[ZOBRIST]
+            self.materialScore = record[MATERIAL]
+            self.positionScore = record[POSITION]
+            self.halfmoveClock = record[HALFMOVE]
+            if not self.whiteToMove:
+                self.fullmoveNumber -= 1
+            if DEBUG_INCREMENTAL_EVAL:
+                self.checkIncrementalScores()
+            self.checkMate = False
+            self.staleMate = False
+
+    '''
+    How many earlier positions of the game equal the current one, counting at most limit of them. The undo stack
+    already holds the zobrist key of every position played, so this only compares keys, and only back to the last
+    capture or pawn move (the halfmove clock) and only every other ply (the same side to move), nothing further
+    back can be the same position.
+    '''
+    def repetitionCount(self, limit=2):
+        ply = len(self.moveLog)
+        key = self._zobristKey
+        undoStack = self.undoStack
+        count = 0
+        for i in range(ply - 2, max(0, ply - self.halfmoveClock) - 1, -2):
+            if undoStack[i][ZOBRIST] == key:
+                count += 1
+                if count >= limit:
+                    break
+        return count
+
+    '''
+    The position at the last capture or pawn move (or the first one on record) as a FEN, and the moves played since
+    in long algebraic notation. createGameState(backend, fen, moves) rebuilds the position together with the history
+    repetitionCount looks at, which a FEN of the current position alone would lose.
+    '''
+    def reversibleHistory(self):
+        plies = min(self.halfmoveClock, len(self.moveLog))
+        moves = self.moveLog[len(self.moveLog) - plies:]
+        for i in range(plies):
+            self.undoMove()
+        fen = self.to_fen()
+        for move in moves:
+            self.makeMove(move)
+        return fen, [move.getChessNotation() for move in moves]
+
+    '''
+    Whether the game is drawn by the fifty move rule or threefold repetition, returns the reason or None
+    '''
+    def drawReason(self):
+        if self.halfmoveClock >= 100:
+            return "fifty-move rule"
+        if self.repetitionCount(2) >= 2:
+            return "threefold repetition"
+        return None
+
+    '''
+    Passes the turn without moving (for null move pruning in the search). It isn't logged in moveLog and has to be
+    taken back with undoNullMove before the move before it is undone. Don't make one while in check.
+    '''
+    def makeNullMove(self):
+        self.nullMoveStack.append((self.enpassantPossible, self._zobristKey, self.halfmoveClock))
+        key = self._zobristKey ^ ZOBRIST_BLACK_TO_MOVE
+        if self.enpassantPossible != ():
+            key ^= ZOBRIST_ENPASSANT[self.enpassantPossible[1]]
+            self.enpassantPossible = ()
+        self._zobristKey = key
+        self.halfmoveClock = 0 #nothing before a null move can repeat in the line after it
+        self.whiteToMove = not self.whiteToMove
+
+    def undoNullMove(self):
+        self.enpassantPossible, self._zobristKey, self.halfmoveClock = self.nullMoveStack.pop()
+        self.whiteToMove = not self.whiteToMove
+        self.checkMate = False
+        self.staleMate = False
+
+    '''
+    64 bit zobrist hash of the position (pieces, side to move, castling rights and en passant file). It is kept up
+    to date by makeMove/undoMove so it can be used as a cache key instead of building a string of the board.
+    '''
+    @property
+    def zobristKey(self):
+        return self._zobristKey
+
+    '''
+    Hashes the position from scratch, used to set up the key and to check the incremental one
+    '''
+    def computeZobristKey(self):
+        key = 0
+        for r in range(8):
+            for c in range(8):
+                piece = self.board[r, c]
+                if piece != "--":
+                    key ^= ZOBRIST_PIECES[piece][r * 8 + c]
+        if not self.whiteToMove:
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        key ^= ZOBRIST_CASTLING[self.castlingRights]
+        if self.enpassantPossible != ():
+            key ^= ZOBRIST_ENPASSANT[self.enpassantPossible[1]]
+        return key
+
+    '''
+    Castling rights as a CastleRights object. The game state itself only keeps the 4 bits in castlingRights.
+    '''
+    @property
+    def currentCastlingRights(self):
+        rights = self.castlingRights
+        return CastleRights(bool(rights & WKS), bool(rights & BKS), bool(rights & WQS), bool(rights & BQS))
+
+    @currentCastlingRights.setter
+    def currentCastlingRights(self, castleRights):
+        self.castlingRights = castleRights.index()
+
+    '''
+    Debug check that the running material and piece-square totals match a full recount of the board
+    '''
+    def checkIncrementalScores(self):
+        material, position = scoreBoardFromScratch(self.board)
+        if material != self.materialScore or position != self.positionScore:
+            raise AssertionError("incremental evaluation out of sync after " + str(len(self.moveLog)) + " moves: " +
+                                 str((self.materialScore, self.positionScore)) + " != " + str((material, position)))
+
     '''
     All moves considering checks
     '''
     def getValidMoves(self, board=np.zeros((8, 8))):
-        if board[1][1] == 0:
-            board = self.board
+        moves = self.generateLegalMoves()
+        if len(moves) == 0:
+            if self.inCheck:
+                self.checkMate = True
+            else:
+                self.staleMate = True
+        else:
+            self.checkMate = False
+            self.staleMate = False
+        return moves
+
+    '''
+    Only the legal captures and promotions, used by the quiescence search and the first stage of move ordering
+    '''
+    def getValidCaptures(self):
+        return self.generateLegalMoves(quiets=False)
+
+    '''
+    Only the legal moves that are not captures or promotions (castling included)
+    '''
+    def getQuietMoves(self):
+        return self.generateLegalMoves(captures=False)
+
+    def isInCheck(self):
+        return self.scanPinsAndChecks()[0]
+
+    '''
+    checkForPinsAndChecks of the current position, kept until the position changes so an isInCheck followed by
+    move generation (as in the quiescence search) only scans once
+    '''
+    def scanPinsAndChecks(self):
+        if self.checkScanKey != self._zobristKey:
+            self.checkScan = self.checkForPinsAndChecks()
+            self.checkScanKey = self._zobristKey
+        return self.checkScan
+
+    '''
+    Legal moves of the side to move, captures (and promotions) and quiet moves can be left out so callers only
+    pay for the part they need. Doesn't touch the checkMate/staleMate flags.
+    '''
+    def generateLegalMoves(self, captures=True, quiets=True):
+        board = self.board
         #advanced algorithm method:
         moves = []
-        self.inCheck, self.pins, self.checks = self.checkForPinsAndChecks()
+        self.inCheck, pins, self.checks = self.scanPinsAndChecks()
+        self.pins = list(pins) #the piece move functions remove the pins they use
         if self.whiteToMove:
-            self.getCastleMoves(self.whiteKingLocation[0], self.whiteKingLocation[1], moves)
             kingRow = self.whiteKingLocation[0]
             kingCol = self.whiteKingLocation[1]
         else:
-            self.getCastleMoves(self.blackKingLocation[0], self.blackKingLocation[1], moves)
             kingRow = self.blackKingLocation[0]
             kingCol = self.blackKingLocation[1]
         if self.inCheck:
             if len(self.checks) == 1: #only 1 check block check or capture checking piece or move king
-                moves = self.getAllPossibleMoves(self.board)
+                moves = self.getAllPossibleMoves(self.board, captures=captures, quiets=quiets)
                 check = self.checks[0]
                 checkRow = check[0]
                 checkCol = check[1]
@@ -160,32 +545,21 @@ class GameState():
                             break
                 #get rid of any moves that dont block the check move the king out of check or kill the attacking piece
                 for i in range(len(moves)-1, -1, -1):
-                    if moves[i].pieceMoved[1] != 'K':
+                    if moves[i].pieceMoved[1] != 'K' and not moves[i].enPassant: #en passant is already checked in full
                         if not(moves[i].endRow, moves[i].endCol) in validSquares:
                             moves.remove(moves[i])
             else:
-                self.getKingMoves(kingRow, kingCol, moves)
-        else:
-            moves = self.getAllPossibleMoves(self.board)
-
-        if len(moves) == 0:
-            if self.inCheck:
-                GameState.checkMate = True
-            else:
-                GameState.staleMate = True
-        else:
-            GameState.checkMate = False
-            GameState.staleMate = False
-        if self.whiteToMove:
-            self.getCastleMoves(self.whiteKingLocation[0], self.whiteKingLocation[1], moves)
+                self.getKingMoves(kingRow, kingCol, moves, captures=captures, quiets=quiets)
         else:
-            self.getCastleMoves(self.blackKingLocation[0], self.blackKingLocation[1], moves)
+            moves = self.getAllPossibleMoves(self.board, captures=captures, quiets=quiets)
+            if quiets: #can't castle out of check so this is only needed here
+                self.getCastleMoves(kingRow, kingCol, moves)
         return moves
 
     '''
     All moves without considering checks
     '''
-    def getAllPossibleMoves(self, board=np.zeros((8, 8))):
+    def getAllPossibleMoves(self, board=np.zeros((8, 8)), captures=True, quiets=True):
         if board[1][1] == 0:
             board = self.board
         moves = []
@@ -194,12 +568,13 @@ class GameState():
                 turn = board[r, c][0]
                 if (turn == 'w' and self.whiteToMove) or (turn == 'b' and not self.whiteToMove):
                     piece = board[r, c][1]
-                    self.moveFunctions[piece](r, c, moves) #calls the appropriate function based on the piece type
+                    #calls the appropriate function based on the piece type
+                    self.moveFunctions[piece](r, c, moves, captures=captures, quiets=quiets)
         return moves
     '''
     Get all the pawn moves for the pawn located at row, col and add these moves to the list
     '''
-    def getPawnMoves(self,r,c,moves,board=np.zeros((8, 8))):
+    def getPawnMoves(self,r,c,moves,board=np.zeros((8, 8)), captures=True, quiets=True):
         if board[1][1] == 0:
             board = self.board
         piecePinned = False
@@ -215,81 +590,56 @@ class GameState():
             startRow = 6
             backRow = 0
             enemyColor = 'b'
-            kingRow, kingCol = self.whiteKingLocation
         else:
             moveAmount = 1
             startRow = 1
             backRow = 7
             enemyColor = 'w'
-            kingRow, kingCol = self.blackKingLocation
         pawnPromotion = False
 
         if board[r+moveAmount, c] == "--": #1 square move
-            if not piecePinned or pinDirection == (moveAmount,0):
+            if not piecePinned or pinDirection == (moveAmount, 0) or pinDirection == (-moveAmount, 0):
                 if r+moveAmount == backRow:
                     pawnPromotion = True
-                moves.append(Move((r, c), (r+moveAmount, c), board, pawnPromotion=pawnPromotion))
-                if r == startRow and board[r+2*moveAmount, c] == "--":#2 square moves
+                if captures if pawnPromotion else quiets: #promotions are generated along with the captures
+                    addPawnMove(moves, (r, c), (r+moveAmount, c), board, pawnPromotion)
+                if quiets and r == startRow and board[r+2*moveAmount, c] == "--":#2 square moves
                     moves.append(Move((r, c), (r+2*moveAmount, c), board))
-        if c-1 >= 0: #capture to the left
-            if not piecePinned or pinDirection == (moveAmount, -1):
-                if board[r + moveAmount, c - 1][0] == enemyColor:
-                    if r + moveAmount == backRow:
-                        pawnPromotion = True
-                    moves.append(Move((r, c), (r+moveAmount, c-1), board, pawnPromotion=pawnPromotion))
-                if (r+moveAmount, c-1) == self.enpassantPossible:
-                    attackingPiece = blockingPiece = False
-                    if kingRow == r:
-                        if kingCol < c: #king column is less than the columns of the pawn
-                            #between the king and the pawn; outside range will be between the king and the border
-                            insideRange = range(kingCol+1, c-1)
-                            outsideRange = range(c + 1, 8)
-                        else:
-                            insideRange = range(kingCol-1, c, -1)
-                            outsideRange = range(c-2, -1, -1)
-                        for i in insideRange:
-                            if board[r, i]!="--": #some other piece than enpassant piece blocks
-                                blockingPiece = True
-                        for i in outsideRange:
-                            square = board[r, i]
-                            if (square[0] == enemyColor and (square[1] == 'R' or square[1] == 'Q')): #attacking piece
-                                attackingPiece = True
-                            elif square != "--":
-                                blockingPiece = True
-                    if not attackingPiece or blockingPiece:
-                        moves.append(Move((r, c), (r+moveAmount, c-1), board, enPassant=True))
-        if c+1 <= 7: #capture to the right
-            if not piecePinned or pinDirection == (moveAmount, 1):
-                if board[r+moveAmount, c + 1][0] == enemyColor:
-                    if r + moveAmount == backRow:
-                        pawnPromotion = True
-                    moves.append(Move((r, c), (r + moveAmount, c + 1), board, pawnPromotion=pawnPromotion))
-                if (r+moveAmount, c+1) == self.enpassantPossible:
-                    attackingPiece = blockingPiece = False
-                    if kingRow == r:
-                        if kingCol < c:  # king column is less than the columns of the pawn
-                            # between the king and the pawn; outside range will be between the king and the border
-                            insideRange = range(kingCol + 1, c)
-                            outsideRange = range(c + 2, 8)
-                        else:
-                            insideRange = range(kingCol - 1, c+1, -1)
-                            outsideRange = range(c - 1, -1, -1)
-                        for i in insideRange:
-                            if board[r, i] != "--":  # some other piece than enpassant piece blocks
-                                blockingPiece = True
-                        for i in outsideRange:
-                            square = board[r, i]
-                            if (square[0] == enemyColor and (square[1] == 'R' or square[1] == 'Q')):  # attacking piece
-                                attackingPiece = True
-                            elif square != "--":
-                                blockingPiece = True
-                    if not attackingPiece or blockingPiece:
-                        moves.append(Move((r, c), (r + moveAmount, c + 1), board, enPassant=True))
+        if not captures:
+            return
+        for d in (-1, 1): #capture to the left then to the right
+            if not 0 <= c + d <= 7:
+                continue
+            #pinned along the diagonal it captures on, either towards the pinning piece or back towards the king
+            if not piecePinned or pinDirection == (moveAmount, d) or pinDirection == (-moveAmount, -d):
+                if board[r + moveAmount, c + d][0] == enemyColor:
+                    addPawnMove(moves, (r, c), (r + moveAmount, c + d), board, r + moveAmount == backRow)
+                if (r + moveAmount, c + d) == self.enpassantPossible and self.enPassantIsLegal(r, c, r + moveAmount, c + d):
+                    moves.append(Move((r, c), (r + moveAmount, c + d), board, enPassant=True))
+
+    '''
+    En passant takes two pawns off the board at once, which the pin and check scans don't account for (a rook
+    behind both pawns on the king's rank, or the captured pawn being the one giving check). So the capture is
+    played on the board and the king is checked directly.
+    '''
+    def enPassantIsLegal(self, r, c, endRow, endCol):
+        board = self.board
+        pawn = board[r, c]
+        captured = board[r, endCol]
+        board[r, c] = "--"
+        board[r, endCol] = "--"
+        board[endRow, endCol] = pawn
+        kingRow, kingCol = self.whiteKingLocation if self.whiteToMove else self.blackKingLocation
+        safe = not self.squareUnderAttack(kingRow, kingCol)
+        board[endRow, endCol] = "--"
+        board[r, endCol] = captured
+        board[r, c] = pawn
+        return safe
 
     '''
     Get all the rook moves for the rook located at the row, col and add these moves to the list
     '''
-    def getRookMoves(self,r,c,moves, board=np.zeros((8, 8))):
+    def getRookMoves(self,r,c,moves, board=np.zeros((8, 8)), captures=True, quiets=True):
         if board[1][1] == 0:
             board = self.board
         piecePinned = False
@@ -311,9 +661,11 @@ class GameState():
                     if not piecePinned or pinDirection == d or pinDirection == (-d[0],-d[1]):
                         endPiece = board[endRow, endCol]
                         if endPiece == "--":
-                            moves.append(Move((r, c), (endRow, endCol), board))
+                            if quiets:
+                                moves.append(Move((r, c), (endRow, endCol), board))
                         elif endPiece[0] == enemyColor:
-                            moves.append(Move((r, c), (endRow, endCol), board))
+                            if captures:
+                                moves.append(Move((r, c), (endRow, endCol), board))
                             break
                         else:
                             break
@@ -325,7 +677,7 @@ class GameState():
         Get all the knight moves for the pawn located at row, col and add these moves to the list
        '''
 
-    def getKnightMoves(self, r, c, moves, board=np.zeros((8, 8))):
+    def getKnightMoves(self, r, c, moves, board=np.zeros((8, 8)), captures=True, quiets=True):
         if board[1][1] == 0:
             board = self.board
         piecePinned = False
@@ -343,7 +695,7 @@ class GameState():
             if 0 <= endRow <= 7 and 0 <= endCol <= 7:
                 if not piecePinned:
                     endPiece = board[endRow,endCol]
-                    if endPiece[0] != allyColor:
+                    if endPiece[0] != allyColor and (quiets if endPiece == "--" else captures):
                         moves.append(Move((r, c), (endRow, endCol), board))
 
 
@@ -351,7 +703,7 @@ class GameState():
        Get all the bishop moves for the pawn located at row, col and add these moves to the list
        '''
 
-    def getBishopMoves(self, r, c, moves, board=np.zeros((8, 8))):
+    def getBishopMoves(self, r, c, moves, board=np.zeros((8, 8)), captures=True, quiets=True):
         if board[1][1] == 0:
             board = self.board
         piecePinned = False
@@ -372,9 +724,11 @@ class GameState():
                     if not piecePinned or pinDirection == d or pinDirection == (-d[0], -d[1]):
                         endPiece = board[endRow,endCol]
                         if endPiece == "--":
-                            moves.append(Move((r, c), (endRow, endCol), board))
+                            if quiets:
+                                moves.append(Move((r, c), (endRow, endCol), board))
                         elif endPiece[0] == enemyColor:
-                            moves.append(Move((r, c), (endRow, endCol), board))
+                            if captures:
+                                moves.append(Move((r, c), (endRow, endCol), board))
                             break
                         else:  # friendly piece capture invalid
                             break
@@ -383,15 +737,15 @@ class GameState():
     '''
     Get all the queen moves for the pawn located at row, col and add these moves to the list
     '''
-    def getQueenMoves(self, r, c, moves):
-        self.getRookMoves(r, c, moves)
-        self.getBishopMoves(r, c, moves)
+    def getQueenMoves(self, r, c, moves, captures=True, quiets=True):
+        self.getRookMoves(r, c, moves, captures=captures, quiets=quiets)
+        self.getBishopMoves(r, c, moves, captures=captures, quiets=quiets)
 
     '''
     Get all the king moves for the pawn located at row, col and add these moves to the list
     '''
 
-    def getKingMoves(self, r, c, moves, board=np.zeros((8, 8))):
+    def getKingMoves(self, r, c, moves, board=np.zeros((8, 8)), captures=True, quiets=True):
         if board[1][1] == 0:
             board = self.board
         rowMoves = (-1, -1, -1, 0, 0, 1, 1, 1)
@@ -402,7 +756,7 @@ class GameState():
             endCol = c + colMoves[i]
             if 0 <= endRow <= 7 and 0 <= endCol <= 7:
                 endPiece = board[endRow,endCol]
-                if endPiece[0] != allyColor:
+                if endPiece[0] != allyColor and (quiets if endPiece == "--" else captures):
                     if allyColor == "w":
                         self.whiteKingLocation = (endRow, endCol)
                     else:
@@ -418,11 +772,9 @@ class GameState():
     def getCastleMoves(self, r, c, moves):
         if self.squareUnderAttack(r, c):
             return  # cant castle when in check
-        if (self.whiteToMove and self.currentCastlingRights.wks) or (
-                not self.whiteToMove and self.currentCastlingRights.bks):
+        if self.castlingRights & (WKS if self.whiteToMove else BKS):
             self.getKingsideCastleMoves(r, c, moves)
-        if (self.whiteToMove and self.currentCastlingRights.wqs) or (
-                not self.whiteToMove and self.currentCastlingRights.bqs):
+        if self.castlingRights & (WQS if self.whiteToMove else BQS):
             self.getQueensideCastleMoves(r, c, moves)
 
     def getKingsideCastleMoves(self, r, c, moves, board=np.zeros((8, 8))):
@@ -442,11 +794,37 @@ class GameState():
     Returns if square is under attack
     '''
     def squareUnderAttack(self, r, c):
-        self.whiteToMove = not self.whiteToMove
-        oppMoves = self.getAllPossibleMoves()
-        self.whiteToMove = not self.whiteToMove
-        for move in oppMoves:
-            if move.endRow == r and move.endCol == c:
+        return self.squareAttackedBy(r, c, "b" if self.whiteToMove else "w")
+
+    '''
+    Returns if a piece of the given color attacks the square. Looks outwards from the square for sliders, knights,
+    pawns and the king instead of generating the opponent's moves.
+    '''
+    def squareAttackedBy(self, r, c, color):
+        board = self.board
+        directions = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+        pawnRow = 1 if color == 'w' else -1 #white pawns attack upwards so they sit one row below the square
+        for j in range(len(directions)):
+            d = directions[j]
+            for i in range(1, 8):
+                endRow = r + d[0] * i
+                endCol = c + d[1] * i
+                if not (0 <= endRow <= 7 and 0 <= endCol <= 7):
+                    break
+                endPiece = board[endRow, endCol]
+                if endPiece == "--":
+                    continue
+                if endPiece[0] == color:
+                    type = endPiece[1]
+                    if type == 'Q' or (j <= 3 and type == 'R') or (j >= 4 and type == 'B') or \
+                            (i == 1 and (type == 'K' or (type == 'P' and j >= 4 and d[0] == pawnRow))):
+                        return True
+                break
+        knightMoves = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+        for m in knightMoves:
+            endRow = r + m[0]
+            endCol = c + m[1]
+            if 0 <= endRow <= 7 and 0 <= endCol <= 7 and board[endRow, endCol] == color + 'N':
                 return True
         return False
     '''
@@ -513,42 +891,6 @@ class GameState():
                     checks.append((endRow, endCol, m[0], m[1]))
         return inCheck, pins, checks
 
-    '''
-    Update the castle rights
-    '''
-    def updateCastleRights(self, move):
-        if move.pieceMoved == "wK":
-            self.currentCastlingRights.wks = False
-            self.currentCastlingRights.wqs = False
-        elif move.pieceMoved == "bK":
-            self.currentCastlingRights.bks = False
-            self.currentCastlingRights.bqs = False
-        elif move.pieceMoved == "wR":
-            if move.startRow == 7:
-                if move.startCol == 0:
-                    self.currentCastlingRights.wqs = False
-                elif move.startCol == 7:
-                    self.currentCastlingRights.wks = False
-        elif move.pieceMoved == "bR":
-            if move.startRow == 0:
-                if move.startCol == 0:
-                    self.currentCastlingRights.bqs = False
-                elif move.startCol == 7:
-                    self.currentCastlingRights.bks = False
-        # if a rook is captured
-        if move.pieceCaptured == "wR":
-            if move.endRow == 7:
-                if move.endCol == 0:
-                    self.currentCastlingRights.wqs = False
-                elif move.endCol == 7:
-                    self.currentCastlingRights.wks = False
-        elif move.pieceCaptured == "bR":
-            if move.endRow == 0:
-                if move.endCol == 0:
-                    self.currentCastlingRights.bqs = False
-                elif move.endCol == 7:
-                    self.currentCastlingRights.bks = False
-
 
 class CastleRights():
     def __init__(self, wks, bks, wqs, bqs):
@@ -557,6 +899,9 @@ class CastleRights():
         self.wqs = wqs
         self.bqs = bqs
 
+    def index(self):
+        return self.wks | self.bks << 1 | self.wqs << 2 | self.bqs << 3
+
 class Move():
     #map keys to values
     #key : value
@@ -566,24 +911,32 @@ class Move():
     filesToCols = {"a": 0, "b": 1, "c": 2, "d": 3,
                    "e": 4, "f": 5, "g": 6,"h": 7}
     colsToFiles = {v: k for k, v in filesToCols.items()}
-
-    def __init__(self, startSq, endSq, board, enPassant = False, pawnPromotion = False, castle=False):
-        self.startRow = startSq[0]
-        self.startCol = startSq[1]
-        self.endRow = endSq[0]
-        self.endCol = endSq[1]
-        self.pieceMoved = board[self.startRow, self.startCol]
-        self.pieceCaptured = board[self.endRow, self.endCol]
+    #a move is created for every pseudo legal move generated, slots keep them small and quick to build (no __dict__)
+    __slots__ = ("startRow", "startCol", "endRow", "endCol", "pieceMoved", "pieceCaptured", "pawnPromotion",
+                 "promotionPiece", "enPassant", "castle", "moveID")
+
+    def __init__(self, startSq, endSq, board, enPassant = False, pawnPromotion = False, castle=False, promotionPiece="Q"):
+        self.startRow = startRow = startSq[0]
+        self.startCol = startCol = startSq[1]
+        self.endRow = endRow = endSq[0]
+        self.endCol = endCol = endSq[1]
+        self.pieceMoved = pieceMoved = PIECE_NAMES[board[startRow, startCol]]
         #pawn promotion
         self.pawnPromotion = pawnPromotion
+        self.promotionPiece = promotionPiece
         #en passant
         self.enPassant = enPassant
         if enPassant:
-            self.pieceCaptured = 'bP' if self.pieceMoved == "wP" else "wP"
+            self.pieceCaptured = 'bP' if pieceMoved == "wP" else "wP"
+        else:
+            self.pieceCaptured = PIECE_NAMES[board[endRow, endCol]]
         #castle move
         self.castle = castle
 
-        self.moveID = self.startRow*1000 + self.startCol*100 + self.endRow*10 + self.endCol #impressive idea
+        moveID = startRow*1000 + startCol*100 + endRow*10 + endCol #impressive idea
+        if pawnPromotion:
+            moveID += PROMOTION_PIECES.index(promotionPiece) * 10000 #queen adds nothing so clicks still match it
+        self.moveID = moveID
     '''
     Overriding the equals method
     '''
@@ -592,12 +945,18 @@ class Move():
             return self.moveID == other.moveID
         return False
 
+    def __hash__(self): # equal moves have the same moveID, so moves can go in sets and be dict keys
+        return self.moveID
+
     def isCapture(self):
         return self.pieceCaptured != "--"
 
     def getChessNotation(self):
         #you can make it more like real chess notation if necessary
-        return self.getRankFile(self.startRow, self.startCol) + self.getRankFile(self.endRow, self.endCol)
+        notation = self.getRankFile(self.startRow, self.startCol) + self.getRankFile(self.endRow, self.endCol)
+        if self.pawnPromotion:
+            notation += self.promotionPiece.lower()
+        return notation
 
     def getRankFile(self, r, c):
         return self.colsToFiles[c] + self.rowsToRanks[r]
@@ -616,11 +975,10 @@ class Move():
 
         #pawn moves
         if self.pieceMoved[1]=='P':
-            if self.isCapture():
-                return self.colsToFiles[self.startCol] + "x" + endSquare
-            else:
-                return endSquare
-            #leaving pawn promotions for now
+            moveString = self.colsToFiles[self.startCol] + "x" + endSquare if self.isCapture() else endSquare
+            if self.pawnPromotion:
+                moveString += "=" + self.promotionPiece
+            return moveString
 
         #two of the same type of piece capable of moving to the same square
         #also adding + for a check move and # for a checkmate move
@@ -2,8 +2,11 @@
 This is our main driver which will be responsible for taking user input and displaying GameState object.
 """
 
+import copy
+import queue
+import threading
 import pygame as p
-from Chess import ChessEngine, SmartMoveFinder
+from Chess import ChessEngine, SmartMoveFinder, ParallelSearch, OpeningBook
 
 BOARD_WIDTH = BOARD_HEIGHT = 560 #400 is another good option
 DIMENSION = 8 #dimension of a chess board is 8x8
@@ -11,7 +14,17 @@ MOVE_LOG_PANEL_WIDTH = 240
 MOVE_LOG_PANEL_HEIGHT = BOARD_HEIGHT
 SQ_SIZE = BOARD_HEIGHT // DIMENSION
 MAX_FPS = 15 #for animations later on
+BOARD_BACKEND = "array" #"array" or "bitboard", see ChessEngine.createGameState
+SEARCH_WORKERS = 1 #more than 1 splits the AI's root moves over that many processes, see ParallelSearch
+PONDER = True #keep searching the reply the AI expects while the human is thinking
+OPENING_BOOK = None #path of a polyglot .bin book the AI plays from while the game is in it
+SELECTIVE_SEARCH = True #null move pruning, late move reductions, pvs and aspiration windows, see SmartMoveFinder.Searcher
 IMAGES = {}
+#the AI's own searcher, its ponder search fills the same table
+aiSearcher = SmartMoveFinder.Searcher(book=OpeningBook.OpeningBook(OPENING_BOOK) if OPENING_BOOK else None,
+                                      selective=SELECTIVE_SEARCH)
+#only used with more than one worker, with the same book and selectivity
+aiParallelSearcher = ParallelSearch.ParallelSearcher(SEARCH_WORKERS, book=aiSearcher.book, selective=SELECTIVE_SEARCH)
 
 '''
 Initialize a global dictionary of images. This will be called exactly once in the main.
@@ -32,7 +45,7 @@ def main():
     clock = p.time.Clock()
     screen.fill(p.Color("white"))
     moveLogFont = p.font.SysFont("Arial", 14, False, False)
-    gs = ChessEngine.GameState()
+    gs = ChessEngine.createGameState(BOARD_BACKEND)
     validMoves = gs.getValidMoves()
     moveMade = False #flag variable for when a move is made
     animate = False #flag variable for when to animate
@@ -44,12 +57,16 @@ def main():
     playerOne = True #If a human is playing white, then this will be true. If AI is playing then it will be false.
     playerTwo = False #Same as above but for black.
     #can add levels of difficulty by using values of integer to know the level of difficulty.
+    aiSearch = None #(thread, cancel event, result queue, ponder move) of the AI search running in the background
+    ponderSearch = None #same, for the search of the position after the reply the AI expects
 
     while running:
         humanTurn = (gs.whiteToMove and playerOne) or (not gs.whiteToMove and playerTwo)
         for e in p.event.get():
             if e.type == p.QUIT:
                 running = False
+                aiSearch = stopAISearch(aiSearch)
+                ponderSearch = stopAISearch(ponderSearch)
             #mouse handles
             elif e.type == p.MOUSEBUTTONDOWN:
                 if not gameOver and humanTurn:
@@ -78,6 +95,8 @@ def main():
             #key handlers
             elif e.type == p.KEYDOWN:
                 if e.key == p.K_z: #undo when z is pressed
+                    aiSearch = stopAISearch(aiSearch)
+                    ponderSearch = stopAISearch(ponderSearch)
                     gs.undoMove()
                     validMoves = gs.getValidMoves()
                     animate = False
@@ -86,7 +105,9 @@ def main():
                 #     sqSelected=() #deselect any clicked piece or square when a is presseed
                 #     playerClicks=[]
                 if e.key == p.K_r and p.key.get_mods() & p.KMOD_SHIFT: #reset the game when 'r + SHIFT' is pressed
-                    gs = ChessEngine.GameState()
+                    aiSearch = stopAISearch(aiSearch)
+                    ponderSearch = stopAISearch(ponderSearch)
+                    gs = ChessEngine.createGameState(BOARD_BACKEND)
                     validMoves = gs.getValidMoves()
                     sqSelected = ()
                     playerClicks = []
@@ -94,14 +115,26 @@ def main():
                     animate = False
                     gameOver = False
 
-        # AI move finder
+        # AI move finder, runs in the background so the window keeps drawing and handling events
         if not gameOver and not humanTurn:
-            AIMove = SmartMoveFinder.findBestMove(gs, validMoves)
-            if AIMove is None:
-                AIMove = SmartMoveFinder.findRandomMove(validMoves)
-            gs.makeMove(AIMove)
-            moveMade = True
-            animate = True
+            if aiSearch is None:
+                if ponderSearch is not None and gs.moveLog and gs.moveLog[-1] == ponderSearch[3]:
+                    aiSearch = ponderSearch #ponder hit, that search is already on this position (or done)
+                else:
+                    stopAISearch(ponderSearch) #ponder miss, the human played something else
+                    aiSearch = startAISearch(gs, validMoves)
+                ponderSearch = None
+            elif not aiSearch[2].empty():
+                AIMove, expectedReply = aiSearch[2].get()
+                aiSearch = None
+                if AIMove is None:
+                    AIMove = SmartMoveFinder.findRandomMove(validMoves)
+                gs.makeMove(AIMove)
+                moveMade = True
+                animate = True
+                humanNext = (gs.whiteToMove and playerOne) or (not gs.whiteToMove and playerTwo)
+                if PONDER and humanNext and expectedReply is not None:
+                    ponderSearch = startAISearch(gs, None, ponderMove=expectedReply)
 
         if moveMade:
             if animate:
@@ -110,11 +143,19 @@ def main():
             moveMade = False
             animate = False
         drawGameState(screen, gs, validMoves, sqSelected, moveLogFont)
+        if aiSearch is not None:
+            drawThinkingIndicator(screen, moveLogFont, "AI is thinking")
+        elif ponderSearch is not None and ponderSearch[2].empty():
+            drawThinkingIndicator(screen, moveLogFont, "AI is pondering")
 
-        if gs.checkMate or gs.staleMate:
+        drawReason = gs.drawReason()
+        if gs.checkMate or gs.staleMate or drawReason:
             gameOver = True
+            ponderSearch = stopAISearch(ponderSearch)
             if gs.staleMate:
                 text = 'STALEMATE'
+            elif not gs.checkMate:
+                text = 'DRAW by ' + drawReason
             else:
                 if gs.whiteToMove:
                     text = 'Black won by CHECKMATE'
@@ -124,6 +165,51 @@ def main():
 
         clock.tick(MAX_FPS)
         p.display.flip()
+    aiParallelSearcher.close()
+'''
+Starts the AI search in a background thread. It works on a copy of the game state so the board being drawn
+doesn't change under the search. When it's done it puts (move, expected reply) on the result queue, the move is
+None if it was cancelled early and the reply (the second move of the principal variation) can be None.
+With a ponderMove the copy plays that move first, so the search is for the position after the human's reply.
+'''
+def startAISearch(gs, validMoves, ponderMove=None):
+    cancel = threading.Event()
+    result = queue.Queue()
+    searchState = copy.deepcopy(gs)
+    if ponderMove is not None:
+        searchState.makeMove(ponderMove)
+        validMoves = searchState.getValidMoves()
+    moves = list(validMoves)
+    def search():
+        expectedReply = None
+        if SEARCH_WORKERS > 1:
+            move = aiParallelSearcher.findBestMove(searchState, moves).move
+        else:
+            move = aiSearcher.findBestMove(searchState, moves, cancel=cancel)
+            pv = aiSearcher.principalVariation
+            if move is not None and len(pv) > 1 and pv[0] == move:
+                expectedReply = pv[1]
+        result.put((move, expectedReply))
+    thread = threading.Thread(target=search, daemon=True)
+    if moves:
+        thread.start()
+    else:
+        result.put((None, None)) #the ponder move ended the game
+    return thread, cancel, result, ponderMove
+
+'''
+Cancels a search started by startAISearch and returns None to clear the handle. The serial search notices the
+cancel within a few nodes and is waited for, so two searches never share SmartMoveFinder's state. The worker
+processes of a parallel search can't be interrupted, that search is left to finish and its move is dropped.
+'''
+def stopAISearch(aiSearch):
+    if aiSearch is not None:
+        thread, cancel, result, ponderMove = aiSearch
+        cancel.set()
+        if SEARCH_WORKERS <= 1 and thread.is_alive():
+            thread.join()
+    return None
+
 '''
 Responsible for all the graphics within a current game state.
 '''
@@ -173,6 +259,14 @@ def drawPieces(screen,board):
             if piece != "--":
                 screen.blit(IMAGES[piece], p.Rect(c*SQ_SIZE, r*SQ_SIZE, SQ_SIZE, SQ_SIZE))
 '''
+Shows what the AI is searching for, at the bottom of the move log panel with the dots counting up
+'''
+def drawThinkingIndicator(screen, font, text):
+    dots = "." * (p.time.get_ticks() // 400 % 4)
+    textObject = font.render(text + dots, True, p.Color("yellow"))
+    screen.blit(textObject, (BOARD_WIDTH + 5, BOARD_HEIGHT - textObject.get_height() - 5))
+
+'''
 Draws the move log
 '''
 def drawMoveLog(screen, gs, font):
@@ -0,0 +1,124 @@
+"""
+Static evaluation tables shared by the game state and the search. A positive score is good for white.
+Every piece is worth its material value from pieceScores plus focusOnPosition times its piece-square score.
+The game state keeps running totals of both (see GameState.materialScore/positionScore) so a leaf can be
+scored without looking at the board.
+"""
+import numpy as np
+
+focusOnPosition = 0.1
+pieceScores = {"K": 0, "N": 3, "Q": 9, "B": 3.5, "R": 5, "P": 1}
+
+knightScore_mg = np.array([[-5, -4, -3, -3, -3, -3, -4, -5],
+                           [-4, -2, 0, 0, 0, 0, -2, -4],
+                           [-3, 0, 1, 1.5, 1.5, 1, 0, -3],
+                           [-3, 0.5, 1.5, 2, 2, 1.5, 0.5, -3],
+                           [-3, 0, 1.5, 2, 2, 1.5, 0.5, -3],
+                           [-3, 0.5, 1, 1.5, 1.5, 1, 0.5, -3],
+                           [-4, -2, 0, 0.5, 0.5, 0, -2, -4],
+                           [-5, -4, -3, -3, -3, -3, -4, 5]])
+
+rookScore_mg = np.array([[0, 0, 0, 0.5, 0.5, 0, 0, 0],
+                         [0.5, 1, 1, 1, 1, 1, 1, 0.5],
+                         [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
+                         [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
+                         [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
+                         [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
+                         [-0.5, 1, 1, 1, 1, 1, 1, -0.5],
+                         [0, 0, 0, 0.5, 0.5, 0, 0, 0]])
+
+bishopScore_mg = np.array([[-2, -1, -1, -1, -1, -1, -1, -2],
+                           [-1, 0.5, 0, 0, 0, 0, 0.5, -1],
+                           [-1, 1, 1, 1, 1, 1, 1, -1],
+                           [-1, 0, 1, 1, 1, 1, 0, -1],
+                           [-1, 0, 1, 1, 1, 1, 0, -1],
+                           [-1, 1, 1, 1, 1, 1, 1, -1],
+                           [-1, 0.5, 0, 0, 0, 0, 0.5, -1],
+                           [-2, -1, -1, -1, -1, -1, -1, -2]])
+
+queenScore_mg = np.array([[-2, -1, -1, -0.5, -0.5, -1, -1, -2],
+                          [-1, 0, 0, 0, 0, 0, 0, -1],
+                          [-1, 0, 0.5, 0, 0, 0.5, 0, -1],
+                          [-1, 0.5, 0.5, 0.5, 0.5, 0.5, 0.5, -1],
+                          [0, 0, 0.5, 0.5, 0.5, 0.5, 0, 0],
+                          [-0.5, 0.5, 0.5, 0.5, 0.5, 0.5, 0.5, -1],
+                          [-1, 0, 0.5, 0, 0, 0.5, 0, -1],
+                          [-2, -1, -1, -0.5, -0.5, -1, -1, -2]])
+
+kingScore_mg = np.array([[-3, -4, -4, -5, -5, -4, -4, -3],
+                         [-3, -4, -4, -5, -5, -4, -4, -3],
+                         [-3, -4, -4, -5, -5, -4, -4, -3],
+                         [-3, -4, -4, -5, -5, -4, -4, -3],
+                         [-3, -4, -4, -5, -5, -4, -4, -3],
+                         [-3, -4, -4, -5, -4, -4, -4, -3],
+                         [-3, -4, -4, -5, -5, -4, -4, -3],
+                         [-3, -4, -4, -5, -5, -4, -4, -3]])
+
+pawnScore_mg = np.array([[90, 90, 90, 90, 90, 90, 90, 90],
+                         [1, 1, 1, 1, 1, 1, 1, 1],
+                         [1, 2, 2, 3, 3, 2, 2, 1],
+                         [0.5, 0.5, 1, 2.5, 2.5, 1, 0.5, 0.5],
+                         [0.5, 0.5, 1, 2.5, 2.5, 1, 0.5, 0.5],
+                         [1, 2, 2, 3, 3, 2, 2, 1],
+                         [1, 1, 1, 1, 1, 1, 1, 1],
+                         [90, 90, 90, 90, 90, 90, 90, 90]])
+
+piecePositionScores_mg = {"N": knightScore_mg, "B": bishopScore_mg, "K": kingScore_mg, "Q": queenScore_mg, "R": rookScore_mg, "P": pawnScore_mg}
+
+#signed per piece lookups, white positive and black negative, indexed by square = row*8 + col
+_signs = (("w", 1), ("b", -1))
+materialScores = {color + piece: sign * pieceScores[piece] for color, sign in _signs for piece in pieceScores}
+positionScores = {color + piece: [sign * float(table[sq // 8, sq % 8]) for sq in range(64)]
+                  for color, sign in _signs for piece, table in piecePositionScores_mg.items()}
+
+
+'''
+Totals the material and piece-square scores of a board from scratch, returns (material, position)
+'''
+def scoreBoardFromScratch(board):
+    material = 0
+    position = 0
+    for row in range(len(board)):
+        for col in range(len(board[row])):
+            square = board[row, col]
+            if square != "--":
+                material += materialScores[square]
+                position += positionScores[square][row * 8 + col]
+    return material, position
+
+
+#integer board encoding for scoring many positions at once: 0 is an empty square, white pieces are 1 to 6 and
+#black pieces the same numbers negated
+PIECE_CODES = {"--": 0}
+PIECE_CODES.update({color + piece: sign * code for color, sign in _signs for code, piece in enumerate("PNBRQK", 1)})
+_codeOffset = 6 #a code plus this is its row in the tables below
+materialByCode = np.zeros(13)
+positionByCode = np.zeros((13, 64))
+for _name, _code in PIECE_CODES.items():
+    if _code != 0:
+        materialByCode[_code + _codeOffset] = materialScores[_name]
+        positionByCode[_code + _codeOffset] = positionScores[_name]
+
+
+_sortedNames = np.array(sorted(PIECE_CODES))
+_sortedCodes = np.array([PIECE_CODES[name] for name in sorted(PIECE_CODES)], dtype=np.int8)
+
+
+'''
+Turns boards of piece strings into PIECE_CODES, an (8, 8) board gives an (8, 8) array and a list or stack of N
+boards gives (N, 8, 8). The lookup is a sorted search over all the squares at once, no python loop per square.
+'''
+def encodeBoards(boards):
+    return _sortedCodes[np.searchsorted(_sortedNames, np.asarray(boards))]
+
+
+'''
+Material plus focusOnPosition times the piece-square score of every board in an (N, 8, 8) array of piece codes,
+in one vectorized pass. Returns the N scores, good for white when positive, the same as scoreBoardFromScratch
+gives for each board one at a time.
+'''
+def scoreBoards(encodedBoards):
+    rows = np.asarray(encodedBoards).reshape(-1, 64).astype(np.intp) + _codeOffset
+    material = materialByCode[rows].sum(axis=1)
+    position = positionByCode[rows, np.arange(64)].sum(axis=1)
+    return material + position * focusOnPosition
@@ -0,0 +1,268 @@
+"""
+Monte Carlo tree search. Every iteration walks down the tree by UCT (the child with the best win rate plus an
+exploration bonus for rarely visited children), adds one new node and scores it with playouts: games played out
+with cheap moves (random, or captures first) for up to MAX_PLAYOUT_PLIES and then judged by the static
+evaluation. The move played is the most visited child of the root.
+
+Leaves are selected in batches with a virtual loss on the way down so a batch spreads over the tree, and the
+playouts of a batch run in a process pool. The tree is kept between moves: when the next search starts from a
+position two plies further down (our move and the reply) that subtree becomes the new root.
+
+    python -m Chess.MonteCarlo --playouts 2000 --workers 4
+"""
+
+import argparse
+import math
+import multiprocessing
+import random
+import time
+from Chess import ChessEngine
+from Chess.Evaluation import focusOnPosition
+from Chess.MoveOrdering import mvvLva
+
+EXPLORATION = math.sqrt(2) #the c of UCT, higher explores more
+DEFAULT_PLAYOUTS = 400
+MAX_PLAYOUT_PLIES = 20 #a playout that hasn't ended by then is scored by the evaluation
+EVALUATION_SCALE = 4 #pawns of advantage that make a 10 to 1 favourite when a playout is cut off
+CAPTURE_BIAS = 0.75 #chance the "capture" policy plays its best capture when it has one
+LEAVES_PER_WORKER = 4 #leaves selected per worker and batch
+POLICIES = ("random", "capture")
+
+
+'''
+Score of a playout for white: 1 for a white win, 0 for a black win, 0.5 for a draw (stalemate, repetition or the
+fifty move rule). A playout cut off after
+maxPlies is scored from the evaluation instead, as the chance of a white win.
+'''
+def playout(gs, maxPlies, policy, rng):
+    plies = 0
+    score = None
+    while plies < maxPlies:
+        if gs.drawReason():
+            score = 0.5
+            break
+        moves = gs.getValidMoves()
+        if not moves:
+            score = 0.5 if gs.staleMate else (0.0 if gs.whiteToMove else 1.0)
+            break
+        move = None
+        if policy == "capture" and rng.random() < CAPTURE_BIAS:
+            captures = [m for m in moves if m.pieceCaptured != "--" or m.pawnPromotion]
+            if captures:
+                move = max(captures, key=mvvLva)
+        gs.makeMove(move if move is not None else rng.choice(moves))
+        plies += 1
+    if score is None:
+        evaluation = gs.materialScore + gs.positionScore * focusOnPosition
+        score = 1 / (1 + 10 ** (-evaluation / EVALUATION_SCALE))
+    for i in range(plies):
+        gs.undoMove()
+    return score
+
+
+'''
+Runs in a worker: count playouts from the position, returns their total score for white. The position comes as
+(fen, moves), see GameState.reversibleHistory, so a playout sees repetitions of positions from before the leaf.
+'''
+def runPlayouts(backend, fen, moves, count, maxPlies, policy, seed):
+    gs = ChessEngine.createGameState(backend, fen, moves)
+    rng = random.Random(seed)
+    return sum(playout(gs, maxPlies, policy, rng) for _ in range(count))
+
+
+class MctsNode:
+    __slots__ = ("move", "parent", "children", "untriedMoves", "visits", "wins", "whiteMoved", "key",
+                 "terminalScore")
+
+    def __init__(self, move, parent, gs):
+        self.move = move #move that led here, None at the root
+        self.parent = parent
+        self.children = []
+        self.untriedMoves = gs.getValidMoves()
+        self.visits = 0
+        self.wins = 0.0 #for the side that played move
+        self.whiteMoved = not gs.whiteToMove
+        self.key = gs.zobristKey
+        self.terminalScore = None #score for white when the game is over here
+        if not self.untriedMoves:
+            self.terminalScore = 0.5 if gs.staleMate else (0.0 if gs.whiteToMove else 1.0)
+        elif gs.drawReason():
+            self.untriedMoves = []
+            self.terminalScore = 0.5
+
+    def uctChild(self, exploration):
+        logVisits = math.log(self.visits)
+        return max(self.children, key=lambda child: child.wins / child.visits +
+                   exploration * math.sqrt(logVisits / child.visits))
+
+    def update(self, whiteScore, playouts):
+        self.wins += whiteScore if self.whiteMoved else playouts - whiteScore
+
+
+class MonteCarloSearcher:
+
+    def __init__(self, workers=1, exploration=EXPLORATION, maxPlayoutPlies=MAX_PLAYOUT_PLIES, policy="random",
+                 playoutsPerLeaf=1, seed=None):
+        if policy not in POLICIES:
+            raise ValueError("unknown playout policy " + str(policy) + ", expected one of " + str(POLICIES))
+        self.workers = workers
+        self.exploration = exploration
+        self.maxPlayoutPlies = maxPlayoutPlies
+        self.policy = policy
+        self.playoutsPerLeaf = playoutsPerLeaf
+        self.rng = random.Random(seed)
+        self.pool = None
+        self.root = None
+        self.playouts = 0 #playouts of the last search
+        self.elapsed = 0.0
+        self.reusedVisits = 0 #visits the root already had from the previous search
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    @property
+    def playoutsPerSecond(self):
+        return self.playouts / self.elapsed if self.elapsed > 0 else 0.0
+
+    '''
+    Finds the node for the position among the root, its children and grandchildren so the work of the last search
+    is kept, or starts a new tree
+    '''
+    def reuseTree(self, gs):
+        if self.root is not None:
+            for node in [self.root] + self.root.children + [grandchild for child in self.root.children
+                                                              for grandchild in child.children]:
+                if node.key == gs.zobristKey:
+                    node.parent = None
+                    node.move = None
+                    return node
+        return MctsNode(None, None, gs)
+
+    '''
+    Searches the position for the given number of playouts or timeLimit milliseconds, whichever ends first, and
+    returns the most visited move (None when there are no legal moves). Without playouts the search runs for
+    DEFAULT_PLAYOUTS, or only until timeLimit if there is one. With validMoves the root only considers those moves.
+    '''
+    def findBestMove(self, gs, validMoves=None, playouts=None, timeLimit=None):
+        if playouts is None:
+            playouts = DEFAULT_PLAYOUTS if timeLimit is None else math.inf
+        start = time.time()
+        deadline = start + timeLimit / 1000 if timeLimit is not None else None
+        gameOverFlags = gs.checkMate, gs.staleMate #the walks down the tree leave them set for other positions
+        self.root = self.reuseTree(gs)
+        self.reusedVisits = self.root.visits
+        if validMoves is not None:
+            allowed = set(move.moveID for move in validMoves)
+            self.root.untriedMoves = [move for move in self.root.untriedMoves if move.moveID in allowed]
+            self.root.children = [child for child in self.root.children if child.move.moveID in allowed]
+        self.playouts = 0
+        batchSize = max(1, self.workers) * LEAVES_PER_WORKER
+        while self.playouts < playouts and (deadline is None or time.time() < deadline):
+            if self.root.terminalScore is not None or (not self.root.children and not self.root.untriedMoves):
+                break
+            leaves = [self.selectLeaf(gs) for _ in range(min(batchSize, playouts - self.playouts))]
+            self.scoreLeaves(gs.backend, leaves)
+        self.elapsed = time.time() - start
+        gs.checkMate, gs.staleMate = gameOverFlags
+        if not self.root.children:
+            return None
+        return max(self.root.children, key=lambda child: child.visits).move
+
+    '''
+    Walks down by UCT from the root, adding a virtual visit to every node on the way so the other leaves of the
+    batch go elsewhere, and expands one new child. Returns (path of nodes, (fen, moves) history of the leaf).
+    '''
+    def selectLeaf(self, gs):
+        node = self.root
+        path = [node]
+        node.visits += 1
+        plies = 0
+        while node.terminalScore is None and not node.untriedMoves and node.children:
+            node = node.uctChild(self.exploration)
+            gs.makeMove(node.move)
+            plies += 1
+            path.append(node)
+            node.visits += 1
+        if node.terminalScore is None and node.untriedMoves:
+            move = node.untriedMoves.pop(self.rng.randrange(len(node.untriedMoves)))
+            gs.makeMove(move)
+            plies += 1
+            child = MctsNode(move, node, gs)
+            node.children.append(child)
+            node = child
+            path.append(node)
+            node.visits += 1
+        history = gs.reversibleHistory() if node.terminalScore is None else None
+        for i in range(plies):
+            gs.undoMove()
+        return path, history
+
+    '''
+    Plays out the leaves (in the pool when there is more than one worker) and backs the scores up their paths
+    '''
+    def scoreLeaves(self, backend, leaves):
+        jobs = [(backend, history[0], history[1], self.playoutsPerLeaf, self.maxPlayoutPlies, self.policy,
+                 self.rng.getrandbits(32)) for path, history in leaves if history is not None]
+        if self.workers > 1 and len(jobs) > 1:
+            if self.pool is None:
+                self.pool = multiprocessing.Pool(self.workers)
+            scores = iter(self.pool.starmap(runPlayouts, jobs))
+        else:
+            scores = iter([runPlayouts(*job) for job in jobs])
+        for path, history in leaves:
+            count = self.playoutsPerLeaf
+            if history is None: #the game is over at the leaf, its result is exact
+                whiteScore = path[-1].terminalScore * count
+            else:
+                whiteScore = next(scores)
+            for node in path:
+                node.visits += count - 1 #one visit was already added on the way down
+                node.update(whiteScore, count)
+            self.playouts += count
+
+    '''
+    The most visited line from the root
+    '''
+    def principalVariation(self):
+        pv = []
+        node = self.root
+        while node is not None and node.children:
+            node = max(node.children, key=lambda child: child.visits)
+            pv.append(node.move)
+        return pv
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="monte carlo tree search of a position")
+    parser.add_argument("--fen", default=ChessEngine.START_FEN)
+    parser.add_argument("--playouts", "-p", type=int,
+                        help="{} by default, unlimited when only --time is given".format(DEFAULT_PLAYOUTS))
+    parser.add_argument("--time", "-t", type=int, help="milliseconds")
+    parser.add_argument("--workers", "-w", type=int, default=1)
+    parser.add_argument("--policy", default="random", choices=POLICIES)
+    parser.add_argument("--max-plies", type=int, default=MAX_PLAYOUT_PLIES)
+    parser.add_argument("--backend", default="array", choices=ChessEngine.BACKENDS)
+    args = parser.parse_args(argv)
+    gs = ChessEngine.createGameState(args.backend, args.fen)
+    searcher = MonteCarloSearcher(args.workers, maxPlayoutPlies=args.max_plies, policy=args.policy)
+    try:
+        move = searcher.findBestMove(gs, playouts=args.playouts, timeLimit=args.time)
+    finally:
+        searcher.close()
+    if move is None:
+        print("no legal moves")
+        return 0
+    for child in sorted(searcher.root.children, key=lambda child: -child.visits)[:5]:
+        print("{:<6} visits {:>6}  win rate {:.3f}".format(child.move.getChessNotation(), child.visits,
+                                                           child.wins / child.visits))
+    print("best {}  pv {}  playouts {}  {:.0f} playouts/s".format(
+        move.getChessNotation(), " ".join(m.getChessNotation() for m in searcher.principalVariation()),
+        searcher.playouts, searcher.playoutsPerSecond))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,134 @@
+"""
+Decides the order the search tries moves in. Alpha-beta cuts off sooner the earlier it sees the best move, so
+moves are handed out in stages: the transposition table move, then captures and promotions by MVV-LVA (most
+valuable victim, least valuable attacker), then the killer moves of the ply, then the remaining quiet moves
+sorted by the history heuristic. Later stages are only generated and sorted if the earlier ones didn't already
+cause a cutoff.
+"""
+
+MAX_PLY = 64
+KILLERS_PER_PLY = 2
+CUTOFF_INDEX_BUCKETS = 8 #beta cutoffs are counted by the index of the move that caused them, the last bucket is 7+
+pieceValues = {"P": 1, "N": 3, "B": 3, "R": 5, "Q": 9, "K": 100}
+
+
+class MoveOrderer():
+
+    def __init__(self):
+        self.killers = [[None] * KILLERS_PER_PLY for _ in range(MAX_PLY)] #moveIDs of quiet moves that cut off
+        self.history = {'w': {}, 'b': {}} #moveID -> how much cutting off that move has done for each colour
+        self.cutoffsByMoveIndex = [0] * CUTOFF_INDEX_BUCKETS #of the running search
+
+    '''
+    Called at the start of a search. Killers belong to the old tree so they are dropped, the history is halved so
+    it still helps but newer cutoffs count for more.
+    '''
+    def newSearch(self):
+        for killers in self.killers:
+            for i in range(KILLERS_PER_PLY):
+                killers[i] = None
+        for history in self.history.values():
+            for moveID in history:
+                history[moveID] //= 2
+        self.cutoffsByMoveIndex = [0] * CUTOFF_INDEX_BUCKETS
+
+    '''
+    Yields an already generated list of moves best first, stage by stage
+    '''
+    def orderMoves(self, moves, ply, hashMoveID=None):
+        hashMove = findMove(moves, hashMoveID)
+        if hashMove is not None:
+            yield hashMove
+        captures = []
+        quiets = []
+        for move in moves:
+            if move is hashMove:
+                continue
+            if move.pieceCaptured != "--" or move.pawnPromotion:
+                captures.append(move)
+            else:
+                quiets.append(move)
+        captures.sort(key=mvvLva, reverse=True)
+        yield from captures
+        yield from self.orderQuiets(quiets, ply)
+
+    '''
+    Same order as orderMoves but the moves are generated in stages too. Captures are generated first and the quiet
+    moves only when the captures didn't cut off, or straight away if the hash move turns out to be quiet.
+    '''
+    def stagedMoves(self, gs, ply, hashMoveID=None):
+        captures = gs.getValidCaptures()
+        quiets = None
+        hashMove = findMove(captures, hashMoveID)
+        if hashMove is None and hashMoveID is not None:
+            quiets = gs.getQuietMoves()
+            hashMove = findMove(quiets, hashMoveID)
+        if hashMove is not None:
+            yield hashMove
+        captures.sort(key=mvvLva, reverse=True)
+        for move in captures:
+            if move is not hashMove:
+                yield move
+        if quiets is None:
+            quiets = gs.getQuietMoves()
+        elif hashMove is not None:
+            quiets = [move for move in quiets if move is not hashMove]
+        yield from self.orderQuiets(quiets, ply)
+
+    '''
+    Killer moves of the ply first, then the rest by history score
+    '''
+    def orderQuiets(self, quiets, ply):
+        if not quiets:
+            return
+        killers = self.killers[ply] if ply < MAX_PLY else ()
+        killerMoves = []
+        others = []
+        for move in quiets:
+            if move.moveID in killers:
+                killerMoves.append(move)
+            else:
+                others.append(move)
+        yield from killerMoves
+        history = self.history[quiets[0].pieceMoved[0]]
+        others.sort(key=lambda m: history.get(m.moveID, 0), reverse=True)
+        yield from others
+
+    '''
+    Tells the orderer that move caused a beta cutoff. moveIndex is where it came in the ordering, 0 being first.
+    '''
+    def recordCutoff(self, move, ply, depth, moveIndex):
+        self.cutoffsByMoveIndex[moveIndex if moveIndex < CUTOFF_INDEX_BUCKETS else -1] += 1
+        if move.pieceCaptured != "--" or move.pawnPromotion:
+            return #captures are already ordered well by mvv-lva
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move.moveID:
+                killers[1] = killers[0]
+                killers[0] = move.moveID
+        history = self.history[move.pieceMoved[0]]
+        history[move.moveID] = history.get(move.moveID, 0) + depth * depth
+
+    '''
+    Fraction of cutoffs that came from the first move tried, the higher the better the ordering
+    '''
+    def firstMoveCutoffRate(self):
+        cutoffs = sum(self.cutoffsByMoveIndex)
+        return self.cutoffsByMoveIndex[0] / cutoffs if cutoffs else 0.0
+
+
+def findMove(moves, moveID):
+    if moveID is not None:
+        for move in moves:
+            if move.moveID == moveID:
+                return move
+    return None
+
+
+def mvvLva(move):
+    score = 0
+    if move.pieceCaptured != "--":
+        score = pieceValues[move.pieceCaptured[1]] * 100 - pieceValues[move.pieceMoved[1]]
+    if move.pawnPromotion:
+        score += pieceValues[move.promotionPiece] * 100
+    return score
@@ -0,0 +1,219 @@
+"""
+Root parallel search. The root moves are dealt out to a pool of worker processes, each worker rebuilds the
+position from its FEN and runs the normal iterative deepening search (SmartMoveFinder.Searcher) over its
+share of the moves. The best move of each share is exact, so the best of those is the move the serial search
+would pick. The workers all use one transposition table in shared memory (see SharedTranspositionTable), so a
+position one worker has searched is a table hit for the others. Each keeps its own move orderer.
+
+    python -m Chess.ParallelSearch --depth 4 --workers 1 2 4 8
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+from Chess import ChessEngine, SmartMoveFinder
+from Chess.MoveOrdering import mvvLva
+from Chess.TranspositionTable import SharedTranspositionTable
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+SHARED_HASH_MB = 64 #size of the table the workers share, 0 gives every worker its own private table instead
+
+#move is None if no iteration finished anywhere, score is in pawns for the side to move from the deepest iteration
+#every share finished, nodes is the total of all the workers and stats has the shape of Searcher.searchStats() for
+#the whole search (None for a book move or without legal moves), see mergeStats
+ParallelResult = namedtuple("ParallelResult", "move score depth nodes stats")
+
+workerSearcher = None #the searcher of a worker process, every worker runs one search at a time
+
+
+'''
+Runs once in every new worker. A forked worker starts with a copy of the parent's memory, its searcher is made
+from scratch here around the shared table (or a private one) so every worker starts from the same state.
+'''
+def initWorker(sharedTableName, selective=False):
+    table = SharedTranspositionTable.attach(sharedTableName) if sharedTableName is not None else None
+    global workerSearcher
+    workerSearcher = SmartMoveFinder.Searcher(table, selective=selective)
+
+
+'''
+Runs in a worker. Rebuilds the position from (fen, moves), see GameState.reversibleHistory, so repetitions are
+seen just as in the serial search, searches the root moves with the given moveIDs and returns the completed
+iterations as [(depth, bestMoveID, score)] plus the searchStats() of the worker's search.
+'''
+def searchRootMoves(backend, fen, moves, moveIDs, maxDepth, timeLimit, nodeLimit):
+    gs = ChessEngine.createGameState(backend, fen, moves)
+    moves = [move for move in gs.getValidMoves() if move.moveID in moveIDs]
+    workerSearcher.findBestMove(gs, moves, maxDepth, timeLimit, nodeLimit)
+    iterations = [(iteration["depth"], iteration["move"].moveID, iteration["score"])
+                  for iteration in workerSearcher.iterationHistory]
+    return iterations, workerSearcher.searchStats()
+
+
+'''
+Puts the searchStats() of the workers together into one dict of the same shape for the whole search. The counters
+are added up, seconds is the time the search took here, pv comes from the share of the best move and iteration
+d has the best move and score over the shares (a share stopped on a mate counts with its last iteration), the
+nodes of all the shares and the time of the slowest one.
+'''
+def mergeStats(workerStats, depth, score, bestMove, seconds, hashFull):
+    stats = {"depth": depth, "score": score, "seconds": seconds, "hashFull": hashFull}
+    for name in ("nodes", "qnodes", "ttProbes", "ttHits", "cutoffs") + SmartMoveFinder.SELECTIVE_STATS:
+        stats[name] = sum(worker[name] for worker in workerStats)
+    stats["nps"] = int((stats["nodes"] + stats["qnodes"]) / seconds) if seconds > 0 else 0
+    stats["ttHitRate"] = stats["ttHits"] / stats["ttProbes"] if stats["ttProbes"] else 0.0
+    stats["cutoffsByMoveIndex"] = [sum(counts) for counts in zip(*(worker["cutoffsByMoveIndex"]
+                                                                   for worker in workerStats))]
+    stats["firstMoveCutoffRate"] = stats["cutoffsByMoveIndex"][0] / stats["cutoffs"] if stats["cutoffs"] else 0.0
+    bestNotation = bestMove.getChessNotation() if bestMove is not None else None
+    stats["pv"] = [bestNotation] if bestNotation is not None else []
+    for worker in workerStats:
+        if worker["pv"] and worker["pv"][0] == bestNotation:
+            stats["pv"] = list(worker["pv"])
+    stats["iterations"] = []
+    previous = 0
+    for d in range(1, depth + 1):
+        reached = [worker["iterations"][d - 1] for worker in workerStats if len(worker["iterations"]) >= d]
+        last = [worker["iterations"][min(d, len(worker["iterations"])) - 1] for worker in workerStats
+                if worker["iterations"]]
+        best = max(last, key=lambda iteration: iteration["score"])
+        nodes = sum(iteration["nodes"] for iteration in reached)
+        stats["iterations"].append({"depth": d, "move": best["move"], "score": best["score"],
+                                    "seconds": max(iteration["seconds"] for iteration in reached), "nodes": nodes,
+                                    "branchingFactor": nodes / previous if previous else None})
+        previous = nodes
+    return stats
+
+
+'''
+Deals the moves round robin after sorting them by mvv-lva, so every worker gets a mix of captures and quiet moves
+'''
+def splitRootMoves(validMoves, workers):
+    moves = sorted(validMoves, key=mvvLva, reverse=True)
+    return [[move.moveID for move in moves[i::workers]] for i in range(workers) if moves[i::workers]]
+
+
+'''
+Parallel counterpart of SmartMoveFinder.Searcher. It owns the worker pool and the table the workers share, both
+are started with the first search and kept until close() because starting processes is slow. The result of a
+search is returned rather than kept on the object, so a search can still be running while the next one starts.
+book and selective mean the same as for Searcher: the book is probed here before any worker is asked, and every
+worker's searcher is made selective.
+'''
+class ParallelSearcher:
+
+    def __init__(self, workers=DEFAULT_WORKERS, hashSizeMB=SHARED_HASH_MB, book=None, selective=False):
+        self.workers = workers
+        self.hashSizeMB = hashSizeMB
+        self.book = book
+        self.selective = selective
+        self.pool = None
+        self.sharedTable = None
+
+    def getPool(self):
+        if self.pool is None:
+            if self.hashSizeMB:
+                self.sharedTable = SharedTranspositionTable(self.hashSizeMB)
+            sharedTableName = self.sharedTable.name if self.sharedTable is not None else None
+            self.pool = multiprocessing.Pool(self.workers, initializer=initWorker,
+                                             initargs=(sharedTableName, self.selective))
+        return self.pool
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        if self.sharedTable is not None:
+            self.sharedTable.close()
+            self.sharedTable = None
+
+    '''
+    Parallel version of Searcher.findBestMove with the same limits, returns a ParallelResult. The result is taken
+    from the deepest iteration every worker finished, so with a time or node limit it is never mixed from
+    different depths. With a single root move (or a single worker) the search runs in this process. A book move
+    comes back straight away, with a depth of 0.
+    '''
+    def findBestMove(self, gs, validMoves, maxDepth=SmartMoveFinder.DEFAULT_DEPTH, timeLimit=None, nodeLimit=None):
+        if not validMoves:
+            return ParallelResult(None, 0, 0, 0, None)
+        if self.book is not None:
+            bookMove = self.book.chooseMove(gs, validMoves)
+            if bookMove is not None:
+                return ParallelResult(bookMove, 0, 0, 0, None)
+        workers = max(1, min(self.workers, len(validMoves)))
+        if workers == 1:
+            searcher = SmartMoveFinder.Searcher(selective=self.selective)
+            move = searcher.findBestMove(gs, validMoves, maxDepth, timeLimit, nodeLimit)
+            return ParallelResult(move, searcher.searchScore, searcher.completedDepth, searcher.counter,
+                                  searcher.searchStats())
+        start = time.time()
+        fen, moves = gs.reversibleHistory()
+        shares = splitRootMoves(validMoves, workers)
+        nodeShare = nodeLimit // len(shares) if nodeLimit is not None else None
+        jobs = [(gs.backend, fen, moves, set(moveIDs), maxDepth, timeLimit, nodeShare) for moveIDs in shares]
+        results = self.getPool().starmap(searchRootMoves, jobs)
+        workerStats = [stats for iterations, stats in results]
+        counter = sum(stats["nodes"] + stats["qnodes"] for stats in workerStats)
+        # a share that stopped on a proven mate is complete at every deeper depth too, its last iteration stands in
+        # for those, so it doesn't hold the others back to the depth it stopped at
+        unfinished = [iterations[-1][0] if iterations else 0 for iterations, stats in results
+                      if not iterations or abs(iterations[-1][2]) != SmartMoveFinder.CHECKMATE]
+        depth = min(unfinished) if unfinished else max(iterations[-1][0] for iterations, stats in results)
+        bestMove, score = None, 0
+        if depth > 0:
+            best = None
+            for iterations, stats in results:
+                moveID, iterationScore = iterations[min(depth, len(iterations)) - 1][1:]
+                if best is None or iterationScore > best[1]:
+                    best = (moveID, iterationScore)
+            for move in validMoves:
+                if move.moveID == best[0]:
+                    bestMove, score = move, best[1]
+        if bestMove is None:
+            depth = 0
+        hashFull = self.sharedTable.hashFull() if self.sharedTable is not None else \
+            max(stats["hashFull"] for stats in workerStats)
+        return ParallelResult(bestMove, score, depth, counter,
+                              mergeStats(workerStats, depth, score, bestMove, time.time() - start, hashFull))
+
+
+'''
+Times a fixed depth search with every worker count and prints the speedup over one worker
+'''
+def benchmark(fen, depth, workerCounts, backend="array", hashSizeMB=SHARED_HASH_MB, out=print):
+    baseline = None
+    for workers in workerCounts:
+        gs = ChessEngine.createGameState(backend, fen)
+        searcher = ParallelSearcher(workers, hashSizeMB)
+        if workers > 1:
+            searcher.getPool() #pool start up isn't part of the search time
+        try:
+            start = time.perf_counter()
+            result = searcher.findBestMove(gs, gs.getValidMoves(), depth)
+            seconds = time.perf_counter() - start
+        finally:
+            searcher.close()
+        if baseline is None:
+            baseline = seconds
+        out("workers {:>2}  move {:<6} score {:>7.2f}  nodes {:>8}  {:>7.2f}s  speedup {:.2f}x".format(
+            workers, result.move.getChessNotation() if result.move else "none", result.score, result.nodes,
+            seconds, baseline / seconds))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="root parallel search speedup per worker count")
+    parser.add_argument("--fen", default=ChessEngine.START_FEN)
+    parser.add_argument("--depth", "-d", type=int, default=SmartMoveFinder.DEFAULT_DEPTH)
+    parser.add_argument("--workers", "-w", type=int, nargs="+", default=[1, 2, 4, DEFAULT_WORKERS])
+    parser.add_argument("--backend", default="array", choices=ChessEngine.BACKENDS)
+    parser.add_argument("--hash-mb", type=int, default=SHARED_HASH_MB, help="shared table size, 0 for private tables")
+    args = parser.parse_args(argv)
+    benchmark(args.fen, args.depth, args.workers, args.backend, args.hash_mb)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,130 @@
+"""
+Perft (performance test) for the move generator. Counts the leaf nodes of the legal move tree to a fixed depth
+and compares them against the published counts of the standard test positions, so every change to the
+generator can be checked for correctness and timed in nodes per second.
+
+    python -m Chess.Perft --suite [--backend bitboard] [--max-nodes 100000]
+    python -m Chess.Perft --fen "<fen>" --depth 3 --divide
+"""
+
+import argparse
+import time
+from Chess import ChessEngine
+
+#(name, fen, leaf counts for depth 1, 2, 3...), from the chessprogramming wiki perft results page
+REFERENCE_POSITIONS = [
+    ("start", ChessEngine.START_FEN,
+     [20, 400, 8902, 197281, 4865609]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862, 4085603]),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 191, 2812, 43238, 674624]),
+    ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264, 9467, 422333]),
+    ("position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [44, 1486, 62379, 2103487]),
+    ("position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890, 3894594]),
+]
+SUITE_MAX_NODES = 100000 #the suite runs each position to the deepest depth with at most this many leaves
+
+
+'''
+Number of leaf nodes of the legal move tree depth plies deep. The last ply is counted from the length of the
+move list instead of being played out (bulk counting).
+'''
+def perft(gs, depth):
+    if depth == 0:
+        return 1
+    moves = gs.getValidMoves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        gs.makeMove(move)
+        nodes += perft(gs, depth - 1)
+        gs.undoMove()
+    return nodes
+
+
+'''
+Perft split by root move, returns a list of (move, nodes). Comparing this against another engine's divide
+output narrows a wrong count down to the move that causes it.
+'''
+def divide(gs, depth):
+    results = []
+    for move in gs.getValidMoves():
+        gs.makeMove(move)
+        results.append((move, perft(gs, depth - 1)))
+        gs.undoMove()
+    return results
+
+
+'''
+Runs perft and returns (nodes, seconds)
+'''
+def timedPerft(gs, depth):
+    start = time.perf_counter()
+    nodes = perft(gs, depth)
+    return nodes, time.perf_counter() - start
+
+
+def nodesPerSecond(nodes, seconds):
+    return int(nodes / seconds) if seconds > 0 else 0
+
+
+'''
+Checks every reference position up to the deepest depth with at most maxNodes leaves. Prints one line per
+depth and returns True if all the counts match.
+'''
+def runSuite(backend="array", maxNodes=SUITE_MAX_NODES, out=print):
+    passed = True
+    totalNodes = 0
+    totalTime = 0.0
+    for name, fen, expectedCounts in REFERENCE_POSITIONS:
+        gs = ChessEngine.createGameState(backend, fen)
+        for depth in range(1, len(expectedCounts) + 1):
+            expected = expectedCounts[depth - 1]
+            if expected > maxNodes:
+                break
+            nodes, seconds = timedPerft(gs, depth)
+            totalNodes += nodes
+            totalTime += seconds
+            ok = nodes == expected
+            passed = passed and ok
+            out("{:<12} depth {}  {:>9} nodes  {:>8.2f}s  {:>8} nps  {}".format(
+                name, depth, nodes, seconds, nodesPerSecond(nodes, seconds),
+                "ok" if ok else "FAILED, expected " + str(expected)))
+    out("total {} nodes in {:.2f}s, {} nps, {}".format(totalNodes, totalTime, nodesPerSecond(totalNodes, totalTime),
+                                                        "all passed" if passed else "FAILURES"))
+    return passed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="perft node counts for the move generator")
+    parser.add_argument("--fen", default=ChessEngine.START_FEN, help="position to count from, the start by default")
+    parser.add_argument("--depth", "-d", type=int, default=3)
+    parser.add_argument("--divide", action="store_true", help="print the node count of every root move")
+    parser.add_argument("--backend", default="array", choices=ChessEngine.BACKENDS)
+    parser.add_argument("--suite", action="store_true", help="check the reference positions instead")
+    parser.add_argument("--max-nodes", type=int, default=SUITE_MAX_NODES, help="node cap per suite entry")
+    args = parser.parse_args(argv)
+
+    if args.suite:
+        return 0 if runSuite(args.backend, args.max_nodes) else 1
+    gs = ChessEngine.createGameState(args.backend, args.fen)
+    start = time.perf_counter()
+    if args.divide:
+        nodes = 0
+        for move, count in divide(gs, args.depth):
+            print(move.getChessNotation() + ": " + str(count))
+            nodes += count
+    else:
+        nodes = perft(gs, args.depth)
+    seconds = time.perf_counter() - start
+    print("nodes {}  time {:.2f}s  nps {}".format(nodes, seconds, nodesPerSecond(nodes, seconds)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,11 +1,9 @@
 import random
-import numpy as np
 import time
-from math import inf as infinity
-
-# todo need to add a simple sorting algorithm
-
-global start_time, end_time, DEPTH, counter, white_cache, black_cache
+from math import inf as infinity, isinf
+from Chess.TranspositionTable import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+from Chess.MoveOrdering import MoveOrderer, mvvLva
+from Chess.Evaluation import pieceScores, focusOnPosition
 
 # def end_game(gs):
 #     pieces = 0
@@ -15,80 +13,419 @@ global start_time, end_time, DEPTH, counter, white_cache, black_cache
 #                 pieces += pieceScores[gs.board[row, col][1]]
 #     return pieces <= 20
 
-white_cache = {}
-black_cache = {}
-pieceScores = {"K": 0, "N": 3, "Q": 9, "B": 3.5, "R": 5, "P": 1}
-
-knightScore_mg = np.array([[-5, -4, -3, -3, -3, -3, -4, -5],
-                           [-4, -2, 0, 0, 0, 0, -2, -4],
-                           [-3, 0, 1, 1.5, 1.5, 1, 0, -3],
-                           [-3, 0.5, 1.5, 2, 2, 1.5, 0.5, -3],
-                           [-3, 0, 1.5, 2, 2, 1.5, 0.5, -3],
-                           [-3, 0.5, 1, 1.5, 1.5, 1, 0.5, -3],
-                           [-4, -2, 0, 0.5, 0.5, 0, -2, -4],
-                           [-5, -4, -3, -3, -3, -3, -4, 5]])
-
-rookScore_mg = np.array([[0, 0, 0, 0.5, 0.5, 0, 0, 0],
-                         [0.5, 1, 1, 1, 1, 1, 1, 0.5],
-                         [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
-                         [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
-                         [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
-                         [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
-                         [-0.5, 1, 1, 1, 1, 1, 1, -0.5],
-                         [0, 0, 0, 0.5, 0.5, 0, 0, 0]])
-
-bishopScore_mg = np.array([[-2, -1, -1, -1, -1, -1, -1, -2],
-                           [-1, 0.5, 0, 0, 0, 0, 0.5, -1],
-                           [-1, 1, 1, 1, 1, 1, 1, -1],
-                           [-1, 0, 1, 1, 1, 1, 0, -1],
-                           [-1, 0, 1, 1, 1, 1, 0, -1],
-                           [-1, 1, 1, 1, 1, 1, 1, -1],
-                           [-1, 0.5, 0, 0, 0, 0, 0.5, -1],
-                           [-2, -1, -1, -1, -1, -1, -1, -2]])
-
-queenScore_mg = np.array([[-2, -1, -1, -0.5, -0.5, -1, -1, -2],
-                          [-1, 0, 0, 0, 0, 0, 0, -1],
-                          [-1, 0, 0.5, 0, 0, 0.5, 0, -1],
-                          [-1, 0.5, 0.5, 0.5, 0.5, 0.5, 0.5, -1],
-                          [0, 0, 0.5, 0.5, 0.5, 0.5, 0, 0],
-                          [-0.5, 0.5, 0.5, 0.5, 0.5, 0.5, 0.5, -1],
-                          [-1, 0, 0.5, 0, 0, 0.5, 0, -1],
-                          [-2, -1, -1, -0.5, -0.5, -1, -1, -2]])
-
-kingScore_mg = np.array([[-3, -4, -4, -5, -5, -4, -4, -3],
-                         [-3, -4, -4, -5, -5, -4, -4, -3],
-                         [-3, -4, -4, -5, -5, -4, -4, -3],
-                         [-3, -4, -4, -5, -5, -4, -4, -3],
-                         [-3, -4, -4, -5, -5, -4, -4, -3],
-                         [-3, -4, -4, -5, -4, -4, -4, -3],
-                         [-3, -4, -4, -5, -5, -4, -4, -3],
-                         [-3, -4, -4, -5, -5, -4, -4, -3]])
-
-pawnScore_mg = np.array([[90, 90, 90, 90, 90, 90, 90, 90],
-                         [1, 1, 1, 1, 1, 1, 1, 1],
-                         [1, 2, 2, 3, 3, 2, 2, 1],
-                         [0.5, 0.5, 1, 2.5, 2.5, 1, 0.5, 0.5],
-                         [0.5, 0.5, 1, 2.5, 2.5, 1, 0.5, 0.5],
-                         [1, 2, 2, 3, 3, 2, 2, 1],
-                         [1, 1, 1, 1, 1, 1, 1, 1],
-                         [90, 90, 90, 90, 90, 90, 90, 90]])
-
-def get_board_position(board):
-    string = ""
-    for r in range(len(board)):
-        for c in range(len(board[r])):
-            string += board[r, c]
-    return string
-
-piecePositionScores_mg = {"N": knightScore_mg, "B": bishopScore_mg, "K": kingScore_mg, "Q": queenScore_mg, "R": rookScore_mg, "P": pawnScore_mg}
 CHECKMATE = infinity
 STALEMATE = 0
+DEFAULT_DEPTH = 3
+TT_SIZE_MB = 32
+LIMIT_CHECK_INTERVAL = 32 #nodes between two looks at the clock, a node costs far more than time.time()
+MAX_QUIESCENCE_PLY = 8
+DELTA_MARGIN = 2 #a capture is skipped if even winning the piece plus this margin can't reach alpha
+#selective search, see Searcher
+NULL_WINDOW = 0.01 #width of a zero window, below the 0.05 pawn step of the evaluation
+NULL_MOVE_MIN_DEPTH = 3
+NULL_MOVE_REDUCTION = 2 #plies the null move search is shallower, one more from depth 6
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVE_INDEX = 3 #the first moves (hash move, captures, killers) are never reduced
+ASPIRATION_WINDOW = 0.5 #pawns either side of the last iteration's score
+ASPIRATION_GROWTH = 4 #the window grows by this each time the score falls outside it
+ASPIRATION_LIMIT = 10 #past this the failing side of the window is opened all the way
+SELECTIVE_STATS = ("nullMoveTries", "nullMoveCutoffs", "reductions", "reductionResearches", "pvsResearches",
+                   "aspirationResearches")
 
 
 # black is trying to make a board as negative as possible and white
 # is trying to make the board as positive as possible.
 
 
+'''
+One search engine. It owns everything a search reads and writes: its transposition table and move orderer, the
+depth and limits of the search that is running, the node count and the result. Searchers don't share anything so
+any number of them can search at the same time, in threads or one after the other, without touching each other's
+results. One searcher runs one search at a time. Two searchers can be given the same table (like the shared one
+of ParallelSearch) to share what they have found. With an opening book (see OpeningBook) it plays book moves
+without searching for as long as the position is in the book.
+
+selective=True turns on four techniques that each search fewer nodes, they can also be switched one by one:
+null move pruning (pass the turn, if a shallower search still fails high the position is too good to need a full
+search, not used in check or with only pawns left where passing can be the best move), late move reductions
+(quiet moves late in the ordering are searched a ply or two shallower, again at full depth if they beat alpha),
+principal variation search (moves after the first get a zero window search that only has to prove they are no
+better, a full window one only if they are) and aspiration windows (each iteration starts with a narrow window
+around the last score, widened when the score falls outside). stats counts what each of them did in the last
+search.
+
+searchStats() describes the last (or running) search: nodes, quiescence nodes, nodes per second, table probes
+and hits, cutoffs by move index, time, nodes and branching factor of every iteration. The onIteration callback of
+findBestMove gets the same dict after every iteration, with no callback it costs nothing.
+'''
+class Searcher:
+
+    def __init__(self, transpositionTable=None, moveOrderer=None, hashSizeMB=TT_SIZE_MB, book=None, selective=False):
+        self.transpositionTable = transpositionTable if transpositionTable is not None else \
+            TranspositionTable(hashSizeMB)
+        self.moveOrderer = moveOrderer if moveOrderer is not None else MoveOrderer()
+        self.book = book
+        self.nullMovePruning = selective
+        self.lateMoveReductions = selective
+        self.principalVariationSearch = selective
+        self.aspirationWindows = selective
+        self.stats = dict.fromkeys(SELECTIVE_STATS, 0)
+        self.rootDepth = DEFAULT_DEPTH #depth of the iteration that is running
+        self.counter = 0 #nodes searched
+        self.qnodes = 0 #the part of counter that was quiescence search
+        self.ttProbesAtStart = 0
+        self.ttHitsAtStart = 0
+        self.startTime = None
+        self.endTime = None
+        self.deadline = None
+        self.nodeLimit = None
+        self.cancel = None #threading.Event from the caller, setting it stops the search
+        self.stopped = False
+        self.nextMove = None #best root move of the iteration that is running
+        self.bestMove = None #result of the last search
+        self.completedDepth = 0
+        self.principalVariation = []
+        self.searchScore = 0 #score of the returned move for the side to move, from the last completed iteration
+        #depth, best move, score, seconds, nodes and branching factor of every completed iteration of the last search
+        self.iterationHistory = []
+
+    '''
+    Sets the memory cap of the transposition table in MB, this clears it
+    '''
+    def setHashSize(self, sizeMB):
+        self.transpositionTable.resize(sizeMB)
+
+    '''
+    Forgets everything learned from earlier games, for a new game
+    '''
+    def clear(self):
+        self.transpositionTable.clear()
+        self.moveOrderer = MoveOrderer()
+
+    '''
+    Iterative deepening driver. Searches depth 1, 2, 3... up to maxDepth and stops early once timeLimit
+    (milliseconds) or nodeLimit is used up. The move returned always comes from the last iteration that finished,
+    and every iteration starts with the previous best move so the earlier work orders the next one. Setting the
+    cancel event (from another thread) stops the search straight away, even in the first iteration, and then None
+    can come back. onIteration(stats) is called with searchStats() after every finished iteration.
+    A book move comes back straight away, with a completed depth of 0.
+    '''
+    def findBestMove(self, gs, validMoves, maxDepth=DEFAULT_DEPTH, timeLimit=None, nodeLimit=None, cancel=None,
+                     onIteration=None):
+        self.startTime = time.time()
+        self.deadline = self.startTime + timeLimit / 1000 if timeLimit is not None else None
+        self.nodeLimit = nodeLimit
+        self.cancel = cancel
+        self.stopped = False
+        self.endTime = None
+        self.counter = 0
+        self.qnodes = 0
+        self.ttProbesAtStart = self.transpositionTable.probes
+        self.ttHitsAtStart = self.transpositionTable.hits
+        self.completedDepth = 0
+        self.principalVariation = []
+        self.searchScore = 0
+        self.iterationHistory = []
+        self.stats = dict.fromkeys(SELECTIVE_STATS, 0)
+        if self.book is not None:
+            bookMove = self.book.chooseMove(gs, validMoves)
+            if bookMove is not None:
+                self.endTime = time.time()
+                self.bestMove = bookMove
+                self.principalVariation = [bookMove]
+                return bookMove
+        self.transpositionTable.newSearch()
+        self.moveOrderer.newSearch()
+        random.shuffle(validMoves)
+        bestMove = None
+        for depth in range(1, maxDepth + 1):
+            self.rootDepth = depth
+            self.nextMove = None
+            iterationStart, nodesBefore = time.time(), self.counter
+            score = self.searchRoot(gs, validMoves, depth)
+            if self.stopped:
+                break
+            bestMove = self.nextMove
+            self.completedDepth = depth
+            self.searchScore = score
+            self.recordIteration(depth, bestMove, score, time.time() - iterationStart, self.counter - nodesBefore)
+            self.principalVariation = self.getPrincipalVariation(gs, depth)
+            if onIteration is not None:
+                onIteration(self.searchStats())
+            if abs(score) == CHECKMATE: # a forced mate either way, searching deeper won't change the move
+                break
+            if bestMove is not None:
+                validMoves.remove(bestMove)
+                validMoves.insert(0, bestMove)
+            if self.deadline is not None and time.time() >= self.deadline:
+                break
+        self.endTime = time.time()
+        self.bestMove = bestMove
+        return bestMove
+
+    def recordIteration(self, depth, move, score, seconds, nodes):
+        previous = self.iterationHistory[-1]["nodes"] if self.iterationHistory else 0
+        self.iterationHistory.append({"depth": depth, "move": move, "score": score, "seconds": seconds, "nodes": nodes,
+                                      "branchingFactor": nodes / previous if previous else None})
+
+    '''
+    Statistics of the last search as a dict, or of the running one so far. nodes and qnodes are the main and
+    quiescence search nodes, cutoffsByMoveIndex[i] the beta cutoffs made by the i-th move tried (a high share at
+    index 0 means good move ordering), hashFull the permille of the table in use (entries are never removed during
+    a search, so it is also the peak), pv the principal variation and iterations has the depth, best move, score,
+    seconds, nodes and effective branching factor (nodes over the nodes of the iteration before) of every finished
+    iteration. Moves are in long algebraic notation (e2e4). The selective search counters of stats are included.
+    '''
+    def searchStats(self):
+        seconds = (self.endTime if self.endTime is not None else time.time()) - self.startTime \
+            if self.startTime is not None else 0.0
+        table = self.transpositionTable
+        probes = table.probes - self.ttProbesAtStart
+        hits = table.hits - self.ttHitsAtStart
+        cutoffsByMoveIndex = self.moveOrderer.cutoffsByMoveIndex
+        stats = {"depth": self.completedDepth, "score": self.searchScore, "nodes": self.counter - self.qnodes,
+                 "qnodes": self.qnodes, "seconds": seconds, "nps": int(self.counter / seconds) if seconds > 0 else 0,
+                 "ttProbes": probes, "ttHits": hits, "ttHitRate": hits / probes if probes else 0.0,
+                 "hashFull": table.hashFull(), "cutoffs": sum(cutoffsByMoveIndex),
+                 "cutoffsByMoveIndex": list(cutoffsByMoveIndex),
+                 "firstMoveCutoffRate": self.moveOrderer.firstMoveCutoffRate(),
+                 "pv": [move.getChessNotation() for move in self.principalVariation],
+                 "iterations": [dict(iteration, move=iteration["move"].getChessNotation()
+                                     if iteration["move"] is not None else None)
+                                for iteration in self.iterationHistory]}
+        stats.update(self.stats)
+        return stats
+
+    '''
+    One iteration at the root. With aspiration windows the window starts narrow around the previous score and is
+    widened (on the side the score fell out of) until the score lands inside it.
+    '''
+    def searchRoot(self, gs, validMoves, depth):
+        turnMultiplier = 1 if gs.whiteToMove else -1
+        if not self.aspirationWindows or not self.iterationHistory or isinf(self.searchScore):
+            return self.negaMaxAlphaBeta(gs, validMoves, depth, -CHECKMATE, CHECKMATE, turnMultiplier)
+        lowWindow = highWindow = ASPIRATION_WINDOW
+        while True:
+            alpha = self.searchScore - lowWindow if lowWindow < ASPIRATION_LIMIT else -CHECKMATE
+            beta = self.searchScore + highWindow if highWindow < ASPIRATION_LIMIT else CHECKMATE
+            score = self.negaMaxAlphaBeta(gs, validMoves, depth, alpha, beta, turnMultiplier)
+            if self.stopped:
+                return score
+            if score <= alpha and not isinf(alpha):
+                lowWindow *= ASPIRATION_GROWTH
+            elif score >= beta and not isinf(beta):
+                highWindow *= ASPIRATION_GROWTH
+            else:
+                return score
+            self.stats["aspirationResearches"] += 1
+
+    '''
+    Follows the best moves stored in the transposition table from the current position
+    '''
+    def getPrincipalVariation(self, gs, depth):
+        pv = []
+        for i in range(depth):
+            entry = self.transpositionTable.peek(gs.zobristKey) # not counted in the search's probes
+            if entry is None or entry[3] is None:
+                break
+            move = None
+            for m in gs.getValidMoves():
+                if m.moveID == entry[3]:
+                    move = m
+                    break
+            if move is None:
+                break
+            pv.append(move)
+            gs.makeMove(move)
+        for i in range(len(pv)):
+            gs.undoMove()
+        return pv
+
+    '''
+    Is just a shorter and easier implementation of minmax it does the same thing as minmax.
+    '''
+    # makes it a bit faster than before huge difference
+    def negaMaxAlphaBeta(self, gs, validMoves, depth, alpha, beta, turnMultiplier, ply=0, allowNull=True): #alpha is the max bound, beta is the lower bound
+        if depth <= 0:
+            return self.quiescenceSearch(gs, alpha, beta, turnMultiplier, 0)
+        self.counter += 1
+        if self.limitReached():
+            return 0
+        # a position seen before in the game or the line is scored a draw the first time it repeats, the side that
+        # could do better will avoid it, and no move can get a line past the fifty move rule
+        if ply > 0 and (gs.halfmoveClock >= 100 or gs.repetitionCount(1)):
+            return STALEMATE
+        alphaOrig = alpha
+        key = gs.zobristKey
+        hashMoveID = None
+        entry = self.transpositionTable.probe(key)
+        if entry is not None:
+            hashMoveID = entry[3]
+            if entry[0] >= depth and ply > 0: # the root always searches so nextMove gets set
+                ttScore, flag = entry[1], entry[2]
+                if flag == EXACT:
+                    return ttScore
+                elif flag == LOWER_BOUND:
+                    alpha = max(alpha, ttScore)
+                else:
+                    beta = min(beta, ttScore)
+                if alpha >= beta:
+                    return ttScore
+        inCheck = None
+        if self.nullMovePruning and allowNull and ply > 0 and depth >= NULL_MOVE_MIN_DEPTH and not isinf(beta):
+            inCheck = gs.isInCheck()
+            if not inCheck and hasNonPawnMaterial(gs) and turnMultiplier * scoreBoard(gs) >= beta:
+                self.stats["nullMoveTries"] += 1
+                reduction = NULL_MOVE_REDUCTION + (1 if depth >= 6 else 0)
+                gs.makeNullMove()
+                score = -self.negaMaxAlphaBeta(gs, None, depth - 1 - reduction, -beta, -beta + NULL_WINDOW,
+                                               -turnMultiplier, ply + 1, False)
+                gs.undoNullMove()
+                if self.stopped:
+                    return 0
+                if score >= beta:
+                    self.stats["nullMoveCutoffs"] += 1
+                    return beta # not the null move's score, that could claim a mate passing doesn't really have
+        reduceLateMoves = self.lateMoveReductions and ply > 0 and depth >= LMR_MIN_DEPTH
+        if reduceLateMoves and inCheck is None:
+            inCheck = gs.isInCheck()
+        # hash move (best move of an earlier iteration), captures by mvv-lva, killers, then quiets by history.
+        # below the root the moves are generated stage by stage so a table hit or an early cutoff skips the rest
+        if validMoves is None:
+            orderedMoves = self.moveOrderer.stagedMoves(gs, ply, hashMoveID)
+        else:
+            orderedMoves = self.moveOrderer.orderMoves(validMoves, ply, hashMoveID)
+        maxScore = -CHECKMATE
+        bestMove = None
+        for moveIndex, move in enumerate(orderedMoves):
+            gs.makeMove(move)
+            reduction = 0
+            if reduceLateMoves and not inCheck and moveIndex >= LMR_MIN_MOVE_INDEX and move.pieceCaptured == "--" \
+                    and not move.pawnPromotion and not gs.isInCheck():
+                reduction = 1 if moveIndex < 6 else 2
+                self.stats["reductions"] += 1
+            if moveIndex > 0 and not isinf(alpha) and (reduction or self.principalVariationSearch):
+                # zero window: only has to show the move is no better than alpha
+                score = -self.negaMaxAlphaBeta(gs, None, depth - 1 - reduction, -alpha - NULL_WINDOW, -alpha,
+                                               -turnMultiplier, ply + 1)
+                fullWindow = False
+                if reduction and score > alpha and not self.stopped:
+                    self.stats["reductionResearches"] += 1
+                    if self.principalVariationSearch:
+                        score = -self.negaMaxAlphaBeta(gs, None, depth - 1, -alpha - NULL_WINDOW, -alpha,
+                                                       -turnMultiplier, ply + 1)
+                    else:
+                        score = -self.negaMaxAlphaBeta(gs, None, depth - 1, -beta, -alpha, -turnMultiplier, ply + 1)
+                        fullWindow = True
+                if not fullWindow and alpha < score < beta and not self.stopped:
+                    self.stats["pvsResearches"] += 1
+                    score = -self.negaMaxAlphaBeta(gs, None, depth - 1, -beta, -alpha, -turnMultiplier, ply + 1)
+            else:
+                score = -self.negaMaxAlphaBeta(gs, None, depth - 1, -beta, -alpha, -turnMultiplier, ply + 1)
+            gs.undoMove()
+            if self.stopped:
+                return 0
+            if score > maxScore or bestMove is None:
+                maxScore = score
+                bestMove = move
+                if ply == 0:
+                    self.nextMove = move
+            if maxScore > alpha:  # pruning happens
+                alpha = maxScore
+            if alpha >= beta:
+                self.moveOrderer.recordCutoff(move, ply, depth, moveIndex)
+                break
+        if bestMove is None: # no legal moves
+            return -CHECKMATE if gs.isInCheck() else STALEMATE
+        if maxScore <= alphaOrig:
+            flag = UPPER_BOUND
+        elif maxScore >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.transpositionTable.store(key, depth, maxScore, flag, bestMove)
+        return maxScore
+
+    '''
+    Stops the search once the node or time budget of findBestMove is spent, or when it is cancelled
+    '''
+    def limitReached(self):
+        counter = self.counter
+        if self.cancel is not None and counter % LIMIT_CHECK_INTERVAL == 0 and self.cancel.is_set():
+            self.stopped = True
+        elif self.rootDepth > 1: # depth 1 always finishes so there is a move to fall back on
+            if (self.nodeLimit is not None and counter >= self.nodeLimit) or \
+                    (self.deadline is not None and counter % LIMIT_CHECK_INTERVAL == 0 and time.time() >= self.deadline):
+                self.stopped = True
+        return self.stopped
+
+    '''
+    Searches only captures and promotions past the horizon so a position isn't scored in the middle of an exchange.
+    The side to move can stand pat on the static score instead of capturing, and captures that couldn't lift the
+    score back to alpha even with DELTA_MARGIN are skipped (delta pruning). In check every evasion is searched.
+    '''
+    def quiescenceSearch(self, gs, alpha, beta, turnMultiplier, qply):
+        self.counter += 1
+        self.qnodes += 1
+        if self.limitReached():
+            return 0
+        inCheck = gs.isInCheck() # the game state keeps this scan, the move generation below reuses it
+        if inCheck:
+            moves = gs.getValidMoves()
+            if len(moves) == 0:
+                return -CHECKMATE
+            if qply >= MAX_QUIESCENCE_PLY:
+                return turnMultiplier * scoreBoard(gs)
+            standPat = bestScore = -CHECKMATE
+        else:
+            standPat = bestScore = turnMultiplier * scoreBoard(gs)
+            if standPat >= beta or qply >= MAX_QUIESCENCE_PLY:
+                return standPat
+            if standPat + pieceScores["Q"] + DELTA_MARGIN < alpha: # not even winning a queen would help
+                return standPat
+            if standPat > alpha:
+                alpha = standPat
+            moves = gs.getValidCaptures()
+        moves.sort(key=mvvLva, reverse=True)
+        for move in moves:
+            if not inCheck:
+                if move.promotionPiece != "Q": # underpromotions only matter for stalemate tricks, not for captures
+                    continue
+                gain = pieceScores[move.pieceCaptured[1]] if move.pieceCaptured != "--" else 0
+                if move.pawnPromotion:
+                    gain += pieceScores[move.promotionPiece] - pieceScores["P"]
+                if standPat + gain + DELTA_MARGIN < alpha:
+                    continue
+            gs.makeMove(move)
+            score = -self.quiescenceSearch(gs, -beta, -alpha, -turnMultiplier, qply + 1)
+            gs.undoMove()
+            if self.stopped:
+                return 0
+            if score > bestScore:
+                bestScore = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return bestScore
+
+
+'''
+Whether the side to move has a piece other than pawns and the king. Without one it can be in zugzwang, where
+every move makes things worse and the null move's assumption that moving helps is wrong.
+'''
+def hasNonPawnMaterial(gs):
+    color = "w" if gs.whiteToMove else "b"
+    for square in gs.board.ravel().tolist():
+        if square[0] == color and square[1] in "NBRQ":
+            return True
+    return False
+
+
+#the searcher behind the module level functions, for callers that only ever run one search at a time
+defaultSearcher = Searcher()
+
+
 '''
 Picks and returns a random move.
 '''
@@ -100,55 +437,24 @@ def findRandomMove(validMoves):
 
 
 '''
-Helper method to make the first recursive call
+Sets the memory cap of the default searcher's transposition table in MB, this clears it
 '''
 
 
-def findBestMove(gs, validMoves):
-    global nextMove, start_time, DEPTH
-    DEPTH = 3
-    start_time = time.time()
-    random.shuffle(validMoves)
-    # findMinMaxMoveRecursively(gs, validMoves, DEPTH, gs.whiteToMove)
-    #findMoveNegaMax(gs, validMoves, DEPTH, 1 if gs.whiteToMove else -1)
-    findMoveNegaMaxAlphaBeta(gs, validMoves, DEPTH, -CHECKMATE, CHECKMATE, 1 if gs.whiteToMove else -1)
-    end_time = time.time()
-    return nextMove
+def setHashSize(sizeMB):
+    defaultSearcher.setHashSize(sizeMB)
 
 
 '''
-Is just a shorter and easier implementation of minmax it does the same thing as minmax.
+Searches with the default searcher, see Searcher.findBestMove. Its node count, score, depth and principal
+variation are on defaultSearcher afterwards. Code that searches from more than one thread should give every
+thread its own Searcher instead.
 '''
 
 
-# makes it a bit faster than before huge difference
-def findMoveNegaMaxAlphaBeta(gs, validMoves, depth, alpha, beta, turnMultiplier): #alpha is the max bound, beta is the lower bound
-    global nextMove, counter, start_time, end_time, DEPTH
-    sorted_list = []
-    if depth == 0:
-        return turnMultiplier * scoreBoard(gs)
-    # move ordering - checks-> captures->attacks implement later for even more efficiecy and faster
-    maxScore = -CHECKMATE
-    for move in validMoves:
-    #     gs.makeMove(move)
-    #     sorted_list.append((move, scoreBoard(gs)))
-    #     gs.undoMove()
-    # sorted(sorted_list, key=lambda x:x[1], reverse=True)
-    # for i in sorted_list:
-    #     move = i[0]
-        gs.makeMove(move)
-        nextMoves = gs.getValidMoves()
-        score = -findMoveNegaMaxAlphaBeta(gs, nextMoves, depth - 1, -beta, -alpha, -turnMultiplier)
-        if score > maxScore:
-            maxScore = score
-            if depth == DEPTH:
-                nextMove = move
-        gs.undoMove()
-        if maxScore > alpha:  # pruning happens
-            alpha = maxScore
-        if alpha >= beta:
-            break
-    return maxScore
+def findBestMove(gs, validMoves, maxDepth=DEFAULT_DEPTH, timeLimit=None, nodeLimit=None, cancel=None,
+                 onIteration=None):
+    return defaultSearcher.findBestMove(gs, validMoves, maxDepth, timeLimit, nodeLimit, cancel, onIteration)
 
 
 '''
@@ -156,21 +462,8 @@ A positive score from this is good for white and vice versa.
 '''
 
 def scoreBoard(gs):
-    # caches the score evaluated for a position making it a bit faster
-    global white_cache, black_cache
-    if gs.whiteToMove:
-        if get_board_position(gs.board) not in white_cache.keys():
-            score = scoring_position(gs)
-            white_cache[get_board_position(gs.board)] = score
-        else:
-            score = white_cache[get_board_position(gs.board)]
-    else:
-        if get_board_position(gs.board) not in black_cache.keys():
-            score = scoring_position(gs)
-            black_cache[get_board_position(gs.board)] = score
-        else:
-            score = black_cache[get_board_position(gs.board)]
-    return score
+    # the running totals on the game state make this O(1) so there is nothing left worth caching
+    return scoring_position(gs)
 
 
 def get_board_coordinates(start_square):
@@ -183,9 +476,6 @@ def get_board_coordinates(start_square):
 
 
 def scoring_position(gs):
-    global white_space, black_space, piecePositionScore
-    focusOnPosition = 0.1
-
     if gs.checkMate:
         if gs.whiteToMove:
             return -CHECKMATE  # black wins
@@ -193,19 +483,8 @@ def scoring_position(gs):
             return CHECKMATE  # white wins
     if gs.staleMate:
         return STALEMATE
-
-    score = 0
-    for row in range(len(gs.board)):
-        for col in range(len(gs.board[row])):
-            square = gs.board[row, col]
-            if square != "--":
-                # score it positionally
-                piecePositionScore = piecePositionScores_mg[square[1]][row, col]
-                if square[0] == 'w':
-                    score += (pieceScores[square[1]] + (piecePositionScore * focusOnPosition))
-                elif square[0] == 'b':
-                    score -= (pieceScores[square[1]] + (piecePositionScore * focusOnPosition))
-    return score
+    # material and piece-square totals are kept up to date by makeMove/undoMove
+    return gs.materialScore + gs.positionScore * focusOnPosition
 
 
 def scoreMaterial(board):
@@ -219,55 +498,64 @@ def scoreMaterial(board):
     return score
 
 
-def monte_carlo_search(gs, validMoves):
-    original_board = gs.board.copy()
-    moves = validMoves
-    w_l_move = {}
-    for move in moves:
-        wins = 0
-        losses = 0
-        draws = 0
-        gs.makeMove(move)
-        game = True
-        for i in range(20):
-            counter = 0
-            while game:
-                if gs.checkMate or gs.staleMate or counter == 100:
-                    if gs.checkMate:
-                        if gs.whiteToMove:
-                            losses += 1
-                        else:
-                            wins += 1
-                    else:
-                        draws += 1
-                    game = False
-                    break
-                if not gs.whiteToMove:
-                    current_move = findRandomMove(gs.getValidMoves())
-                else:
-                    current_move = findBestMove(gs, gs.getValidMoves())
-                counter += 1
-                gs.makeMove(current_move)
-            while not (gs.board == original_board).all():
-                gs.undoMove()
-        w_l_ratio = wins / 20
-        w_l_move[w_l_ratio] = move
-        print("{:.2f}".format(w_l_ratio))
-
-    best_ratio = -infinity
-    best_move = None
-    for ratio, move in w_l_move.items():
-        if best_move == None or ratio > best_ratio:
-            best_ratio = ratio
-            best_move = move
-    print(best_ratio)
-    print(best_move)
-    return best_move
-
-
+'''
+Picks a move by Monte Carlo tree search instead of alpha-beta, see MonteCarlo.MonteCarloSearcher. Passing the
+same searcher for every move of a game keeps its tree and process pool from one move to the next, without one a
+searcher is made for this move only. With just a timeLimit the search runs for the whole time.
+'''
 
 
+def monte_carlo_search(gs, validMoves, playouts=None, timeLimit=None, workers=1, searcher=None):
+    from Chess.MonteCarlo import MonteCarloSearcher
+    if searcher is not None:
+        return searcher.findBestMove(gs, validMoves, playouts, timeLimit)
+    searcher = MonteCarloSearcher(workers)
+    try:
+        return searcher.findBestMove(gs, validMoves, playouts, timeLimit)
+    finally:
+        searcher.close()
 
 
+'''
+Searches every position to a fixed depth with plain alpha-beta, with all of the selective techniques and with
+all of them but one, and prints the nodes of each so the saving of every technique can be seen on its own
+'''
 
 
+def selectivityBenchmark(fens, depth, backend="array", out=print):
+    from Chess import ChessEngine
+    techniques = ("nullMovePruning", "lateMoveReductions", "principalVariationSearch", "aspirationWindows")
+    settings = [("plain", ()), ("selective", techniques)] + \
+               [("without " + name, tuple(t for t in techniques if t != name)) for name in techniques]
+    totals = dict.fromkeys([label for label, enabled in settings], 0)
+    for fen in fens:
+        for label, enabled in settings:
+            searcher = Searcher()
+            for name in enabled:
+                setattr(searcher, name, True)
+            gs = ChessEngine.createGameState(backend, fen)
+            random.seed(0)
+            move = searcher.findBestMove(gs, gs.getValidMoves(), depth)
+            totals[label] += searcher.counter
+            out("{:<34} {:<6} {:>7.2f} {:>9} nodes  {}".format(label, move.getChessNotation() if move else "none",
+                searcher.searchScore, searcher.counter,
+                " ".join("{}={}".format(k, v) for k, v in searcher.stats.items() if v)))
+        out("")
+    for label, nodes in totals.items():
+        out("{:<34} {:>9} nodes {:>7.1%} of plain".format(label, nodes, nodes / max(totals["plain"], 1)))
+
+
+def main(argv=None):
+    import argparse
+    from Chess import ChessEngine
+    parser = argparse.ArgumentParser(description="nodes searched with and without each selective technique")
+    parser.add_argument("--fen", nargs="+", default=[ChessEngine.START_FEN])
+    parser.add_argument("--depth", "-d", type=int, default=4)
+    parser.add_argument("--backend", default="array", choices=ChessEngine.BACKENDS)
+    args = parser.parse_args(argv)
+    selectivityBenchmark(args.fen, args.depth, args.backend)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,221 @@
+"""
+Fixed size transposition table for the search. Positions are stored by their zobrist key together with the
+depth they were searched to, the score, what kind of bound the score is and the best move found, so the search
+can cut off or narrow its window when it reaches a position it has already seen.
+"""
+
+import numpy as np
+from multiprocessing import shared_memory
+
+EXACT = 0
+LOWER_BOUND = 1 #score is at least this (the search failed high)
+UPPER_BOUND = 2 #score is at most this (the search failed low)
+
+ENTRY_BYTES = 160 #rough size of one stored entry in python (tuple, key int, score and the list slot)
+
+
+class TranspositionTable():
+
+    def __init__(self, sizeMB=16):
+        self.resize(sizeMB)
+
+    '''
+    Sets the memory cap. The number of slots is rounded down to a power of two so a slot is just key & mask.
+    '''
+    def resize(self, sizeMB):
+        entries = max(1, int(sizeMB * 1024 * 1024) // ENTRY_BYTES)
+        self.size = 1 << (entries.bit_length() - 1)
+        self.mask = self.size - 1
+        self.sizeMB = sizeMB
+        self.clear()
+
+    def clear(self):
+        self.table = [None] * self.size #each slot holds (key, depth, score, flag, bestMoveID, age)
+        self.age = 0
+        self.filled = 0
+        self.probes = 0
+        self.hits = 0
+
+    '''
+    Called at the start of every search, entries from older searches can then be replaced even if they are deeper
+    '''
+    def newSearch(self):
+        self.age += 1
+
+    '''
+    Returns (depth, score, flag, bestMoveID) for the position or None if it isn't stored
+    '''
+    def probe(self, key):
+        self.probes += 1
+        entry = self.table[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry[1:5]
+        return None
+
+    '''
+    Same as probe but left out of the probe and hit counts, for lookups that aren't part of the search (like
+    following the principal variation)
+    '''
+    def peek(self, key):
+        entry = self.table[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry[1:5]
+        return None
+
+    '''
+    Depth preferred replacement with aging: a slot is overwritten when it is empty, holds the same position,
+    was written by an older search or was searched to the same or a lower depth.
+    '''
+    def store(self, key, depth, score, flag, bestMove=None):
+        index = key & self.mask
+        entry = self.table[index]
+        bestMoveID = bestMove.moveID if bestMove is not None else None
+        if entry is None:
+            self.filled += 1
+        elif entry[0] == key:
+            if bestMoveID is None:
+                bestMoveID = entry[4] #keep the old best move rather than forgetting it
+        elif entry[5] == self.age and entry[1] > depth:
+            return
+        self.table[index] = (key, depth, score, flag, bestMoveID, self.age)
+
+    '''
+    How full the table is in permille, the same measure UCI engines report as hashfull
+    '''
+    def hashFull(self):
+        return self.filled * 1000 // self.size
+
+
+SHARED_ENTRY_BYTES = 24 #three 64 bit words: key ^ data ^ score bits, data, score
+SHARED_HASHFULL_SAMPLE = 1000 #slots looked at by hashFull, every process fills the table so there's no count
+
+
+'''
+The same table laid out in shared memory so the worker processes of a parallel search can all read and write it
+without pickling or locks. Every slot is three 64 bit words: the score as a float, a data word packing the depth,
+bound, best move and age, and the key xor'ed with the other two. A slot torn by two processes writing at once
+then fails the key check on the next probe and is treated as a miss (the lockless hashing trick of Hyatt and
+Mann). The age lives in a header word so all processes agree on it.
+'''
+class SharedTranspositionTable():
+
+    def __init__(self, sizeMB=16, name=None):
+        self.memory = None
+        if name is None:
+            self.owner = True
+            self.resize(sizeMB)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            self.size = (self.memory.size - 8) // SHARED_ENTRY_BYTES
+            self.size = 1 << (self.size.bit_length() - 1) #the os can round the block up
+            self.owner = False
+            self.mapBlock()
+
+    '''
+    Sets the memory cap, this clears the table. A shared block can't grow or shrink in place so a new one is created
+    under a new name, processes attached to the old one have to attach to the new name. Only the process that
+    created the table can resize it.
+    '''
+    def resize(self, sizeMB):
+        if not self.owner:
+            raise ValueError("only the process that created a shared transposition table can resize it")
+        if self.memory is not None:
+            self.close()
+        entries = max(1, int(sizeMB * 1024 * 1024) // SHARED_ENTRY_BYTES)
+        self.size = 1 << (entries.bit_length() - 1)
+        self.memory = shared_memory.SharedMemory(create=True, size=8 + self.size * SHARED_ENTRY_BYTES)
+        self.mapBlock()
+        self.clear()
+
+    def mapBlock(self):
+        self.mask = self.size - 1
+        self.sizeMB = self.size * SHARED_ENTRY_BYTES / (1024 * 1024)
+        self.header = np.ndarray((1,), dtype=np.uint64, buffer=self.memory.buf)
+        self.words = np.ndarray((self.size, 3), dtype=np.uint64, buffer=self.memory.buf, offset=8)
+        self.scores = self.words.view(np.float64)
+        self.probes = 0
+        self.hits = 0
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    '''
+    Opens a table another process created, by the name of its shared memory block
+    '''
+    @classmethod
+    def attach(cls, name):
+        return cls(name=name)
+
+    def clear(self):
+        self.words.fill(0) #a data word of 0 never passes as an entry, see packData
+        self.header[0] = 0
+        self.probes = 0
+        self.hits = 0
+
+    def newSearch(self):
+        self.header[0] = (int(self.header[0]) + 1) & 0xFF
+
+    @property
+    def age(self):
+        return int(self.header[0])
+
+    def probe(self, key):
+        self.probes += 1
+        entry = self.peek(key)
+        if entry is not None:
+            self.hits += 1
+        return entry
+
+    def peek(self, key):
+        slot = self.words[key & self.mask]
+        check, data, scoreBits = int(slot[0]), int(slot[1]), int(slot[2])
+        if data and check ^ data ^ scoreBits == key:
+            moveID = data >> 19 & 0xFFFF
+            return data >> 3 & 0xFF, float(self.scores[key & self.mask, 2]), data >> 1 & 0x3, \
+                moveID - 1 if moveID else None
+        return None
+
+    '''
+    Same replacement rule as TranspositionTable.store. The data and score go in before the check word, a reader
+    that sees a half written slot gets a key mismatch.
+    '''
+    def store(self, key, depth, score, flag, bestMove=None):
+        index = key & self.mask
+        slot = self.words[index]
+        check, oldData, oldScoreBits = int(slot[0]), int(slot[1]), int(slot[2])
+        age = int(self.header[0])
+        bestMoveID = bestMove.moveID if bestMove is not None else None
+        if oldData and check ^ oldData ^ oldScoreBits == key:
+            if bestMoveID is None and oldData >> 19 & 0xFFFF:
+                bestMoveID = (oldData >> 19 & 0xFFFF) - 1
+        elif oldData and oldData >> 11 & 0xFF == age and oldData >> 3 & 0xFF > depth:
+            return
+        data = packData(depth, flag, bestMoveID, age)
+        self.scores[index, 2] = score
+        self.words[index, 1] = data
+        self.words[index, 0] = key ^ data ^ int(self.words[index, 2])
+
+    def hashFull(self):
+        sample = self.words[:min(self.size, SHARED_HASHFULL_SAMPLE), 1]
+        return int(np.count_nonzero(sample)) * 1000 // len(sample)
+
+    '''
+    Lets go of the shared memory, the process that created the table also frees it
+    '''
+    def close(self):
+        self.header = self.words = self.scores = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+        self.memory = None
+
+
+'''
+Packs an entry into one 64 bit word: bit 0 is always set so a used slot is never 0, then the bound (2 bits), the
+depth (8 bits), the age (8 bits) and the best moveID + 1 (16 bits, 0 for none)
+'''
+def packData(depth, flag, bestMoveID, age):
+    moveBits = bestMoveID + 1 if bestMoveID is not None else 0
+    return 1 | flag << 1 | min(depth, 0xFF) << 3 | age << 11 | moveBits << 19
@@ -0,0 +1,239 @@
+"""
+Headless UCI (universal chess interface) front end, so the engine can run under tournament managers and match
+servers without a display. Reads commands from stdin and answers on stdout:
+
+    python -m Chess.Uci
+
+Supports uci, isready, ucinewgame, setoption (Hash, Backend, BookFile, Selective), position startpos/fen ... moves ..., go with
+depth/movetime/wtime/btime/winc/binc/movestogo/nodes/infinite, stop and quit. The search runs in a background
+thread so stop is answered while it is thinking, and every finished iteration is reported with an info line.
+"""
+
+import sys
+import threading
+from math import isinf
+from Chess import ChessEngine, SmartMoveFinder, OpeningBook
+from Chess.MoveOrdering import MAX_PLY
+
+ENGINE_NAME = "Chess-Engine"
+ENGINE_AUTHOR = "Swaymaw"
+MAX_DEPTH = MAX_PLY #go without a depth searches until the time, node budget or stop ends it
+DEFAULT_MOVES_TO_GO = 30 #moves the remaining clock time is spread over when the gui doesn't say
+MOVE_OVERHEAD = 50 #milliseconds kept back per move for the gui and process communication
+MIN_HASH_MB = 1 #range of the Hash option, larger or smaller values are clamped to it
+MAX_HASH_MB = 1024
+
+
+'''
+Milliseconds to spend on a move from the clock of the side to move: an even share of the remaining time plus
+most of the increment, never more than the time that is actually left.
+'''
+def allocateTime(timeLeft, increment=0, movesToGo=None):
+    movesToGo = movesToGo if movesToGo else DEFAULT_MOVES_TO_GO
+    budget = timeLeft / movesToGo + increment * 3 / 4
+    return max(1, min(budget, timeLeft - MOVE_OVERHEAD))
+
+
+'''
+The score part of an info line. Scores are in pawns for the side to move, a mate is infinite so the distance is
+taken from the principal variation.
+'''
+def formatScore(score, pv):
+    if isinf(score):
+        moves = (len(pv) + 1) // 2
+        return "mate " + str(moves if score > 0 else -moves)
+    return "cp " + str(int(round(score * 100)))
+
+
+class UciEngine:
+    def __init__(self, out=None):
+        self.out = out if out is not None else self.write
+        self.backend = "array"
+        self.gs = ChessEngine.createGameState(self.backend)
+        self.searcher = SmartMoveFinder.Searcher(selective=True)
+        self.searchThread = None
+        self.cancel = None
+        self.outputLock = threading.Lock()
+
+    @staticmethod
+    def write(line):
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+    def send(self, line):
+        with self.outputLock:
+            self.out(line)
+
+    '''
+    Handles one line of input, returns False on quit
+    '''
+    def handle(self, line):
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == "uci":
+            self.send("id name " + ENGINE_NAME)
+            self.send("id author " + ENGINE_AUTHOR)
+            self.send("option name Hash type spin default {} min {} max {}".format(SmartMoveFinder.TT_SIZE_MB,
+                                                                                     MIN_HASH_MB, MAX_HASH_MB))
+            self.send("option name Backend type combo default array" +
+                      "".join(" var " + backend for backend in ChessEngine.BACKENDS))
+            self.send("option name BookFile type string default <empty>")
+            self.send("option name Selective type check default true")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "ucinewgame":
+            self.stop()
+            self.searcher.clear()
+        elif command == "setoption":
+            self.stop()
+            self.setOption(args)
+        elif command == "position":
+            self.stop()
+            self.setPosition(args)
+        elif command == "go":
+            self.stop()
+            self.go(args)
+        elif command == "stop":
+            self.stop()
+        elif command == "quit":
+            self.stop()
+            return False
+        return True
+
+    def setOption(self, args):
+        if "name" not in args or "value" not in args:
+            return
+        name = " ".join(args[args.index("name") + 1:args.index("value")]).lower()
+        value = " ".join(args[args.index("value") + 1:])
+        if name == "hash":
+            try:
+                sizeMB = min(max(int(value), MIN_HASH_MB), MAX_HASH_MB)
+            except ValueError:
+                self.send("info string bad hash size " + value)
+                return
+            self.searcher.setHashSize(sizeMB)
+            self.send("info string hash size " + str(sizeMB) + " MB")
+        elif name == "backend" and value in ChessEngine.BACKENDS:
+            self.backend = value
+            self.gs = ChessEngine.createGameState(self.backend, self.gs.to_fen())
+        elif name == "selective":
+            selective = value.lower() == "true"
+            self.searcher.nullMovePruning = self.searcher.lateMoveReductions = selective
+            self.searcher.principalVariationSearch = self.searcher.aspirationWindows = selective
+        elif name == "bookfile":
+            if self.searcher.book is not None:
+                self.searcher.book.close()
+                self.searcher.book = None
+            if value and value != "<empty>":
+                try:
+                    self.searcher.book = OpeningBook.OpeningBook(value)
+                except OSError as error:
+                    self.send("info string can't open book " + str(error))
+
+    '''
+    position startpos [moves ...] or position fen <fen> [moves ...]. The moves are in long algebraic notation
+    (e2e4, e7e8q), an illegal one is reported and it and the moves after it are ignored.
+    '''
+    def setPosition(self, args):
+        moves = args.index("moves") if "moves" in args else len(args)
+        if args and args[0] == "fen":
+            fen = " ".join(args[1:moves])
+        else:
+            fen = ChessEngine.START_FEN
+        try:
+            self.gs = ChessEngine.createGameState(self.backend, fen)
+        except ValueError as error:
+            self.send("info string bad fen " + str(error))
+            self.gs = ChessEngine.createGameState(self.backend)
+            return
+        for notation in args[moves + 1:]:
+            move = self.findMove(notation)
+            if move is None:
+                self.send("info string illegal move " + notation)
+                break
+            self.gs.makeMove(move)
+
+    def findMove(self, notation):
+        for move in self.gs.getValidMoves():
+            if move.getChessNotation() == notation:
+                return move
+        return None
+
+    '''
+    Starts the search in the background with the limits of the go command. A limit with a value that isn't a
+    number is reported and left out, the search still runs so the gui gets its bestmove.
+    '''
+    def go(self, args):
+        options = {}
+        infinite = "infinite" in args
+        for i, token in enumerate(args[:-1]):
+            if token in ("depth", "movetime", "wtime", "btime", "winc", "binc", "movestogo", "nodes"):
+                try:
+                    options[token] = int(args[i + 1])
+                except ValueError:
+                    self.send("info string bad value for " + token + " " + args[i + 1])
+        maxDepth = min(options.get("depth", MAX_DEPTH), MAX_DEPTH)
+        nodeLimit = options.get("nodes")
+        timeLimit = options.get("movetime")
+        clock, increment = ("wtime", "winc") if self.gs.whiteToMove else ("btime", "binc")
+        if timeLimit is None and clock in options and not infinite:
+            timeLimit = allocateTime(options[clock], options.get(increment, 0), options.get("movestogo"))
+        self.cancel = threading.Event()
+        self.searchThread = threading.Thread(target=self.search, daemon=True,
+                                             args=(maxDepth, timeLimit, nodeLimit, infinite, self.cancel))
+        self.searchThread.start()
+
+    '''
+    Runs in the search thread. Whatever happens a bestmove is sent, the gui would wait for it forever otherwise: an
+    error is reported with an info line and the first legal move (or 0000 without one) is played instead.
+    '''
+    def search(self, maxDepth, timeLimit, nodeLimit, infinite, cancel):
+        try:
+            validMoves = self.gs.getValidMoves()
+        except Exception as error:
+            self.send("info string move generation failed: " + repr(error))
+            validMoves = []
+        if not validMoves:
+            self.send("bestmove 0000")
+            return
+        def report(stats):
+            self.send("info depth {} score {} nodes {} nps {} hashfull {} time {} pv {}".format(
+                stats["depth"], formatScore(stats["score"], stats["pv"]), stats["nodes"] + stats["qnodes"],
+                stats["nps"], stats["hashFull"], int(stats["seconds"] * 1000), " ".join(stats["pv"])))
+        firstMove = validMoves[0] #the search reorders the list
+        try:
+            move = self.searcher.findBestMove(self.gs, validMoves, maxDepth, timeLimit, nodeLimit, cancel, report)
+        except Exception as error:
+            self.send("info string search failed: " + repr(error))
+            move = None
+        if move is None: #stopped before the first iteration finished, or failed
+            move = firstMove
+        if infinite:
+            cancel.wait() #under go infinite the best move is only sent after stop
+        self.send("bestmove " + move.getChessNotation())
+
+    '''
+    Stops a running search and waits for it to send its best move
+    '''
+    def stop(self):
+        if self.searchThread is not None:
+            self.cancel.set()
+            self.searchThread.join()
+            self.searchThread = None
+            self.cancel = None
+
+
+def main(stream=None):
+    engine = UciEngine()
+    for line in stream if stream is not None else sys.stdin:
+        if not engine.handle(line):
+            break
+    engine.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,34 @@
+"""
+Batch analysis keeps going when a single position fails
+"""
+
+import pytest
+from Chess import Analysis, SmartMoveFinder
+
+LINES = [
+    "4k3/8/8/8/8/8/3P4/4K3 w - - 0 1",
+    "8/8/8/8 w - -", #bad fen
+    "6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1", #its search raises, see failingSearch
+    "4k3/8/8/8/8/8/8/3QK3 w - - 0 1",
+]
+FAILING_FEN = LINES[2]
+
+
+@pytest.fixture
+def failingSearch(monkeypatch):
+    findBestMove = SmartMoveFinder.Searcher.findBestMove
+    def search(self, gs, *args, **kwargs):
+        if gs.to_fen() == FAILING_FEN:
+            raise IndexError("move generation crashed")
+        return findBestMove(self, gs, *args, **kwargs)
+    monkeypatch.setattr(SmartMoveFinder.Searcher, "findBestMove", search)
+
+
+@pytest.mark.parametrize("workers", [1, 2]) #the pool's workers are forked so they see the patched search too
+def test_failing_position_does_not_stop_the_batch(failingSearch, workers):
+    results = sorted(Analysis.analyzePositions(LINES, maxDepth=2, workers=workers), key=lambda result: result.index)
+    assert [result.index for result in results] == [0, 1, 2, 3]
+    assert results[1].error is not None and results[1].bestMove is None
+    assert "move generation crashed" in results[2].error and results[2].bestMove is None
+    for result in (results[0], results[3]):
+        assert result.error is None and result.bestMove is not None and result.depth == 2
@@ -0,0 +1,51 @@
+"""
+FEN import and export of both backends. The package imports itself as Chess, so run from the directory above it:
+
+    python -m pytest Chess/tests
+"""
+
+import pytest
+from Chess import ChessEngine
+
+BACKENDS = ChessEngine.BACKENDS
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("fen", [
+    ChessEngine.START_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "rnbqkbnr/pppp1ppp/8/8/3Pp3/8/PPP1PPPP/RNBQKBNR b KQkq d3 0 3",
+    "4k3/8/8/3Pp3/8/8/8/4K3 w - e6 0 1",
+])
+def test_round_trip(backend, fen):
+    assert ChessEngine.createGameState(backend, fen).to_fen() == fen
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_en_passant_capture_is_generated(backend):
+    gs = ChessEngine.createGameState(backend, "4k3/8/8/3Pp3/8/8/8/4K3 w - e6 0 1")
+    assert [move.getChessNotation() for move in gs.getValidMoves() if move.enPassant] == ["d5e6"]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("fen", [
+    "4k3/8/8/8/8/8/3P4/4K3 w - e3 0 1", #en passant square on the wrong rank for the side to move
+    "4k3/8/8/8/8/8/8/4K3 w - e6 0 1", #no pawn behind the en passant square
+    "4k3/8/8/8/8/8/8/4K3 w - - -1 1", #negative halfmove clock
+    "4k3/8/8/8/8/8/8/4K3 w - - 0 0", #fullmove number below 1
+    "4k3/8/8/8/8/8/8/p3K3 b - - 0 1", #pawn on the first rank
+    "P3k3/8/8/8/8/8/8/4K3 w - - 0 1", #pawn on the last rank
+    "4k3/4R3/8/8/8/8/8/4K3 w - - 0 1", #the side not to move is in check
+    "4k3/8/8/8/8/8/8/8 w - - 0 1", #no white king
+    "4k3/8/8/8/8/8/8/4K3 x - - 0 1", #bad side to move
+])
+def test_invalid_fen_is_rejected(backend, fen):
+    with pytest.raises(ValueError):
+        ChessEngine.createGameState(backend, fen)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_side_to_move_may_be_in_check(backend):
+    gs = ChessEngine.createGameState(backend, "4k3/4R3/8/8/8/8/8/4K3 b - - 0 1")
+    assert gs.isInCheck()
+    assert len(gs.getValidMoves()) > 0
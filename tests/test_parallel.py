@@ -0,0 +1,32 @@
+"""
+Search statistics of the serial and the parallel search
+"""
+
+from Chess import ChessEngine, SmartMoveFinder
+from Chess.ParallelSearch import ParallelSearcher
+
+
+def test_principal_variation_is_not_counted_as_probes():
+    gs = ChessEngine.createGameState()
+    searcher = SmartMoveFinder.Searcher()
+    searcher.findBestMove(gs, gs.getValidMoves(), 3)
+    table = searcher.transpositionTable
+    probes, hits = table.probes, table.hits
+    assert searcher.getPrincipalVariation(gs, 3)
+    assert (table.probes, table.hits) == (probes, hits)
+
+
+def test_parallel_result_carries_merged_stats():
+    gs = ChessEngine.createGameState()
+    searcher = ParallelSearcher(2)
+    try:
+        result = searcher.findBestMove(gs, gs.getValidMoves(), 3)
+    finally:
+        searcher.close()
+    stats = result.stats
+    assert stats["depth"] == result.depth == 3
+    assert stats["nodes"] + stats["qnodes"] == result.nodes
+    assert stats["pv"][0] == result.move.getChessNotation()
+    assert [iteration["depth"] for iteration in stats["iterations"]] == [1, 2, 3]
+    assert stats["iterations"][-1]["move"] == result.move.getChessNotation()
+    assert 0 < stats["ttHits"] <= stats["ttProbes"]